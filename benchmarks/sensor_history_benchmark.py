@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Storage benchmark of the sensor history over synthetic multi-year histories.
+
+Every dataset (years x plants x storage backend) is generated and measured in its own process
+(isolated peak RSS) in a temporary directory - the components run on the simulated hardware backend.
+
+Measured operations:
+- insert: persistence path of `query_and_persist_sensor_values` (sensor history and rollups)
+- history: `/plants/history` with every combination of date range, stream and paging query params
+- latest: lookup of the latest sensor history entry in the storage (comparable with earlier runs)
+- latest_plant_readings: cached lookup of the latest reading per plant of the water check
+- clean_up: `clean_up_plant_history` removing the older half of the history
+
+A dataset which fails is reported (its traceback on stderr) and the remaining datasets are measured anyway,
+the command exits with status 1 if any dataset failed.
+
+Usage:
+    python benchmarks/sensor_history_benchmark.py --years 1 2 5 --plants 5 50 --backend segmented tinydb --json results.json
+
+Results of the default datasets (segmented backend, `ulimit -n 1024` as on the Raspberry Pi) are kept in
+sensor_history_benchmark_results.json to compare later runs with.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLING_INTERVAL_MIN = 42 # see water_system_runner.QUERY_SENSOR_VALUES_INTERVAL_MIN
+MIFLORA_PLANT_SHARE = 0.2
+IMPORT_CHUNK_SIZE = 2000
+
+
+#############################
+# measurement of operations #
+#############################
+
+def io_bytes_written() -> Optional[int]:
+    """ bytes written by the process so far (Linux only) """
+    try:
+        with open('/proc/self/io') as io_file:
+            for line in io_file:
+                if line.startswith('wchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_kb() -> int:
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss // 1024 if sys.platform == 'darwin' else peak_rss
+
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def measure(operation: Callable[[int], None], runs: int) -> dict:
+    """ run an operation several times and summarize latency percentiles (ms) and bytes written """
+    latencies_ms: List[float] = []
+    bytes_before = io_bytes_written()
+    for run in range(runs):
+        start = time.perf_counter()
+        operation(run)
+        latencies_ms.append((time.perf_counter() - start) * 1000)
+    bytes_after = io_bytes_written()
+
+    latencies_ms.sort()
+    return {
+        'runs': runs,
+        'p50_ms': percentile(latencies_ms, 50),
+        'p90_ms': percentile(latencies_ms, 90),
+        'p99_ms': percentile(latencies_ms, 99),
+        'max_ms': latencies_ms[-1],
+        'mean_ms': statistics.mean(latencies_ms),
+        'bytes_written': bytes_after - bytes_before if bytes_before is not None and bytes_after is not None else None,
+    }
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    """ percentile with linear interpolation between closest ranks """
+    position = (len(sorted_values) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+############################
+# synthetic sensor history #
+############################
+
+def create_plant_configurations(plants: int) -> List[dict]:
+    configurations = []
+    for number in range(plants):
+        configuration = {
+            'id': f'benchmark{number:04d}',
+            'plant': f'Plant {number}',
+            'sensor_type': 'moisture_capacitve',
+            'sensor_channel': number % 8,
+            'relay_pin': 5,
+            'activated': True,
+            'water_duration_sec': 0,
+            'water_iterations': 1,
+            'max_moisture': 90,
+            'min_moisture': 30
+        }
+        if number < plants * MIFLORA_PLANT_SHARE:
+            configuration['mac_adress'] = 'C4:7C:8D:6A:{:02X}:{:02X}'.format(number // 256, number % 256)
+        configurations.append(configuration)
+    return configurations
+
+
+def generate_entries(start: datetime, count: int, configurations: List[dict], rand: random.Random):
+    """ generate sensor history entries every sampling interval - soil dries and is watered below min moisture """
+    moistures = {configuration['id']: rand.uniform(30, 90) for configuration in configurations}
+    for number in range(count):
+        ts = start + timedelta(minutes=SAMPLING_INTERVAL_MIN * number)
+        hour = ts.hour + ts.minute / 60
+        daylight = max(0.0, 1 - abs(hour - 12) / 6)
+        plants = []
+        for configuration in configurations:
+            moisture = moistures[configuration['id']] - rand.uniform(0, 0.6)
+            moistures[configuration['id']] = moisture if moisture > configuration['min_moisture'] else 90
+            plant = {'id': configuration['id'], 'name': configuration['plant'], 'moisture': round(moisture)}
+            if 'mac_adress' in configuration:
+                plant.update(conductivity=round(300 + 10 * moisture), sunlight=round(20000 * daylight), temperature=round(18 + 6 * daylight, 1), batteryLevel=87)
+            plants.append(plant)
+        yield {
+            'ts': ts.isoformat(timespec='seconds'),
+            'plants': plants,
+            'temperature': round(18 + 6 * daylight + rand.gauss(0, 0.3), 1),
+            'humidity': round(60 - 10 * daylight + rand.gauss(0, 1), 1),
+            'visible_light': round(260 + 400 * daylight),
+            'UV_index': round(6 * daylight, 2),
+            'IR_light': round(250 + 800 * daylight)
+        }
+
+
+############################
+# benchmark of one dataset #
+############################
+
+def run_dataset(years: float, plants: int, backend: str, inserts: int, repeat: int, seed: int) -> dict:
+    """ generate one dataset in a temporary directory and measure all operations """
+    workspace = tempfile.mkdtemp(prefix='water_system_benchmark_')
+    try:
+        for directory in ('db', 'log', 'run'):
+            os.makedirs(os.path.join(workspace, directory))
+        # db and log paths of the app are relative ('../db/...')
+        os.chdir(os.path.join(workspace, 'run'))
+        sys.path.insert(0, REPO_ROOT)
+
+        # simulated hardware backend (see src.waterSystem.components.hardware_backend) - set before components are imported
+        os.environ.setdefault('WATER_SYSTEM_HARDWARE', 'simulated')
+
+        from src.db.db_adapter import DbAdapter, SCHEDULED_JOBS_CONFIGURATION_TABLE_NAME
+        DbAdapter._sensor_history_storage = backend
+        db_adapter = DbAdapter()
+
+        from fastapi.testclient import TestClient
+        import src.api.api as api
+        from src.model.plant_entry import PlantSensorEntry
+        from src.model.plant_configuration import PlantConfiguration
+        from src.waterSystem.water_system_db_helper import persist_sensor_entry, clean_up_plant_history, get_latest_plant_readings
+
+        rand = random.Random(seed)
+        configurations = create_plant_configurations(plants)
+        for configuration in configurations:
+            db_adapter.plant_configurations.insert(PlantConfiguration.parse_obj(configuration))
+        max_plant_history_months = max(1, round(years * 12 / 2))
+        db_adapter.storage_writer.execute(
+            db_adapter.master_data_db.table(SCHEDULED_JOBS_CONFIGURATION_TABLE_NAME).insert, {'max_plant_history_months': max_plant_history_months})
+
+        # history up to now, followed by the measured inserts
+        count = int(years * 365 * 24 * 60 / SAMPLING_INTERVAL_MIN)
+        start = datetime.now().replace(microsecond=0) - timedelta(minutes=SAMPLING_INTERVAL_MIN * count)
+        entries = generate_entries(start, count + inserts, configurations, rand)
+
+        load_start = time.perf_counter()
+        remaining = count
+        while remaining > 0:
+            chunk = list(itertools.islice(entries, min(IMPORT_CHUNK_SIZE, remaining)))
+            db_adapter.storage_writer.execute(db_adapter.sensor_history.import_documents, chunk)
+            remaining -= len(chunk)
+        for sensor_history_rollup in db_adapter.sensor_history_rollups.values():
+            sensor_history_rollup.catch_up(db_adapter.sensor_history)
+        load_sec = time.perf_counter() - load_start
+
+        results: Dict[str, dict] = {}
+        insert_entries = [PlantSensorEntry.parse_obj(entry) for entry in entries]
+        results['insert'] = measure(lambda run: persist_sensor_entry(insert_entries[run]), len(insert_entries))
+
+        client = TestClient(api.app)
+        end = datetime.now().date()
+        range_start = (end - timedelta(days=30)).isoformat()
+        range_end = (end - timedelta(days=1)).isoformat()
+        for with_start, with_end, mode in itertools.product((False, True), (False, True), ('list', 'stream', 'page')):
+            params = {}
+            if with_start:
+                params['range_start_date'] = range_start
+            if with_end:
+                params['range_end_date'] = range_end
+            if mode == 'stream':
+                params['stream'] = 'true'
+            if mode == 'page':
+                params['limit'] = 100
+            name = 'history[{}]'.format(','.join([key for key in ('range_start_date', 'range_end_date') if key in params] + [mode]))
+            results[name] = measure(lambda run: client.get('/plants/history', params=params).raise_for_status(), repeat)
+
+        results['latest'] = measure(lambda run: PlantSensorEntry.parse_obj(db_adapter.sensor_history.latest()), repeat * 100)
+        results['latest_plant_readings'] = measure(lambda run: get_latest_plant_readings(), repeat * 100)
+        size_before_clean_up = directory_size(os.path.join(workspace, 'db'))
+        results['clean_up'] = measure(lambda run: clean_up_plant_history(), 1)
+
+        return {
+            'years': years,
+            'plants': plants,
+            'backend': backend,
+            'entries': count,
+            'load_sec': load_sec,
+            'db_bytes': size_before_clean_up,
+            'peak_rss_kb': peak_rss_kb(),
+            'operations': results
+        }
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+#####################
+# command line tool #
+#####################
+
+def print_report(dataset: dict) -> None:
+    print('\n{backend}: {years} years, {plants} plants, {entries} entries (load {load_sec:.1f} s, db {db_mb:.1f} MB, peak RSS {rss_mb:.1f} MB)'.format(
+        db_mb=dataset['db_bytes'] / 1024 / 1024, rss_mb=dataset['peak_rss_kb'] / 1024, **dataset))
+    print('  {:<48} {:>6} {:>10} {:>10} {:>10} {:>10} {:>14}'.format('operation', 'runs', 'p50 ms', 'p90 ms', 'p99 ms', 'max ms', 'bytes written'))
+    for name, result in dataset['operations'].items():
+        print('  {:<48} {:>6} {:>10.2f} {:>10.2f} {:>10.2f} {:>10.2f} {:>14}'.format(
+            name, result['runs'], result['p50_ms'], result['p90_ms'], result['p99_ms'], result['max_ms'],
+            result['bytes_written'] if result['bytes_written'] is not None else '-'))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark of the sensor history storage over synthetic histories')
+    parser.add_argument('--years', type=float, nargs='+', default=[1, 2, 5], help='years of sensor history per dataset')
+    parser.add_argument('--plants', type=int, nargs='+', default=[5, 50], help='number of plants per dataset')
+    parser.add_argument('--backend', nargs='+', default=['segmented'], choices=['segmented', 'tinydb'], help='sensor history storage backends')
+    parser.add_argument('--inserts', type=int, default=200, help='number of measured inserts per dataset')
+    parser.add_argument('--repeat', type=int, default=5, help='number of runs of every history query')
+    parser.add_argument('--seed', type=int, default=42, help='random seed of the synthetic history')
+    parser.add_argument('--json', help='write results to json file (e.g. to compare runs)')
+    parser.add_argument('--dataset', help=argparse.SUPPRESS) # run one dataset (in a child process)
+    args = parser.parse_args()
+
+    if args.dataset:
+        years, plants, backend = args.dataset.split(':')
+        print(json.dumps(run_dataset(float(years), int(plants), backend, args.inserts, args.repeat, args.seed)))
+        return
+
+    datasets = []
+    failed_datasets = []
+    for backend, years, plants in itertools.product(args.backend, args.years, args.plants):
+        dataset_name = f'{backend}: {years} years, {plants} plants'
+        process = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--dataset', f'{years}:{plants}:{backend}',
+             '--inserts', str(args.inserts), '--repeat', str(args.repeat), '--seed', str(args.seed)],
+            stdout=subprocess.PIPE, universal_newlines=True)
+        try:
+            if process.returncode != 0:
+                raise RuntimeError(f'exit code {process.returncode}')
+            dataset = json.loads(process.stdout.strip().splitlines()[-1])
+        except (RuntimeError, ValueError, IndexError) as error:
+            # traceback of the dataset process is printed to stderr - the remaining datasets are measured anyway
+            print(f'\n{dataset_name} FAILED ({error})', file=sys.stderr)
+            failed_datasets.append(dataset_name)
+            datasets.append({'years': years, 'plants': plants, 'backend': backend, 'error': str(error)})
+            continue
+        print_report(dataset)
+        datasets.append(dataset)
+
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(datasets, json_file, indent=2)
+
+    if failed_datasets:
+        print('\nFailed datasets:\n  ' + '\n  '.join(failed_datasets), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
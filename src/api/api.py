@@ -1,16 +1,36 @@
 #!/usr/bin/env python3
 from src.model.water_system_state import WaterSystemState
 from src.log.logger import setup_logger
-from src.model.plant_entry import PlantSensorEntry
+from src.log.log_reader import tail_lines, follow_lines
+from src.log.log_search import search_log
+import logging
+from src.model.plant_entry import PlantSensorEntry, Plant
 import uuid 
-from typing import List, Optional
-
-from fastapi import FastAPI, Query as FastAPIQuery, Path, Body, status, Response, HTTPException
-from tinydb.queries import where, Query
-from datetime import date, datetime
+import base64
+import json
+import os
+from collections import deque
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Iterable, List, Optional, Tuple
+
+from fastapi import FastAPI, Query as FastAPIQuery, Path, Body, Header, status, Response, HTTPException
+from fastapi.responses import StreamingResponse, FileResponse
+from datetime import date, datetime, time, timedelta
 from src.model.plant_configuration import PlantConfiguration
 from src.model.app_type import AppType
+from src.model.log_level import LogLevel
+from src.model.log_entry import LogEntry
+from src.model.rollup_resolution import RollupResolution
+from src.model.plant_rollup import PlantSensorRollup
+from src.model.tank_level_entry import TankLevelEntry
+from src.model.picture import Picture
+from src.model.export_format import ExportFormat
 from src.db.db_adapter import DbAdapter
+from src.db.data_version import DataVersion
+from src.db.sensor_history_export import iter_export, is_export_format_available, EXPORT_MEDIA_TYPES
+from src.api.json_gzip_middleware import JsonGZipMiddleware
+from src.waterSystem.picture_pipeline import picture_pipeline
+from src.waterSystem.miflora_poller_pool import miflora_poller_pool, DEFAULT_MIFLORA_READING_TTL_SEC
 from src.waterSystem.water_system_runner import get_state_of_water_system, resume_water_system, pause_water_system, start_water_system_daemon, shutdown_water_system, start_water_chron_daemon
 
 # setup uvicorn loggers
@@ -18,14 +38,28 @@ setup_logger('uvicorn.error', '../log/api.log')
 setup_logger('uvicorn.access', '../log/api.log')
 
 # history db initialisation
-plant_db = DbAdapter().plant_db
-sensor_history = plant_db.table('sensor_history')
-# master data db initialisation
-master_data_db = DbAdapter().master_data_db
-plants_configuration = master_data_db.table('plants_configuration')
+sensor_history = DbAdapter().sensor_history
+sensor_history_rollups = DbAdapter().sensor_history_rollups
+tank_level_history = DbAdapter().tank_level_history
+# master data db initialisation (cached plants configuration)
+plants_configuration = DbAdapter().plant_configurations
+
+JSON_MEDIA_TYPE = 'application/json'
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+EVENT_STREAM_MEDIA_TYPE = 'text/event-stream'
+LOG_FOLLOW_HEARTBEAT_SEC = 15
+DEFAULT_LOG_SEARCH_LIMIT = 100
+PICTURE_MEDIA_TYPE = 'image/jpeg'
+PICTURE_CACHE_CONTROL = 'public, max-age=86400'
+DATA_CACHE_CONTROL = 'no-cache' # cached by clients, but revalidated by ETag on every request
+GZIP_MINIMUM_SIZE = 1024 # min size of a json response in bytes to be compressed
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+DEFAULT_HISTORY_PAGE_SIZE = 100
+MAX_HISTORY_PAGE_SIZE = 5000
 
 # start api
 app = FastAPI()
+app.add_middleware(JsonGZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE, compresslevel=6)
 
 @app.on_event("startup")
 def startup():
@@ -80,10 +114,67 @@ def get_app_log_fragment(
     Get log file entries of app.
     By default a fragment of the latest **10 log entries** will be supplied
     """
-    if app_type is AppType.water_app:
-        return get_log_fragment(log_size, '../log/water_system.log')
-    if app_type is AppType.api:
-        return get_log_fragment(log_size, '../log/api.log')
+    return get_log_fragment(log_size, get_log_file_path(app_type))
+
+
+@app.get("/app/log/follow", tags=["app"])
+def follow_app_log(
+    app_type: AppType = FastAPIQuery(AppType.water_app, title="ApplicationType", description="Log file of application type: `water_app` OR `api`"),
+    log_size: int = FastAPIQuery(0, title="LogSize", description="Number of the last log entries to send before following")
+):
+    """
+    Follow the log file of app as [Server-Sent Events](https://developer.mozilla.org/en-US/docs/Web/API/Server-sent_events).
+
+    Every new log entry is pushed as one `data` event. Rotated log files are followed.
+    A comment is sent as heart beat if there are no new log entries.
+    """
+    log_file_path = get_log_file_path(app_type)
+
+    def log_events():
+        for line in tail_lines(log_file_path, log_size):
+            yield to_server_sent_event(line)
+        last_event = datetime.now()
+        for line in follow_lines(log_file_path):
+            if line is not None:
+                last_event = datetime.now()
+                yield to_server_sent_event(line)
+            elif (datetime.now() - last_event).total_seconds() >= LOG_FOLLOW_HEARTBEAT_SEC:
+                last_event = datetime.now()
+                yield ': heartbeat\n\n'
+
+    return StreamingResponse(log_events(), media_type=EVENT_STREAM_MEDIA_TYPE, headers={'Cache-Control': 'no-cache'})
+
+
+@app.get("/app/log/search", response_model=List[LogEntry], tags=["app"])
+def search_app_log(
+    app_type: AppType = FastAPIQuery(AppType.water_app, title="ApplicationType", description="Log file of application type: `water_app` OR `api`"),
+    start: Optional[datetime] = FastAPIQuery(None, description="Start time (inclusive) of log entries in ISO format"),
+    end: Optional[datetime] = FastAPIQuery(None, description="End time (exclusive) of log entries in ISO format"),
+    level: Optional[LogLevel] = FastAPIQuery(None, description="Minimum level of log entries"),
+    tag: Optional[str] = FastAPIQuery(None, description="Tag of log entries, e.g. `WATERING` or `PICTURE`"),
+    plant_id: Optional[str] = FastAPIQuery(None, description="ID of plant the log entries refer to (by its ID or name)"),
+    limit: int = FastAPIQuery(DEFAULT_LOG_SEARCH_LIMIT, ge=1, description="Max number of (latest) log entries")
+):
+    """
+    Search log entries of app (including rotated log files) by time range, level, tag and plant.
+
+    Log entries are looked up by the index written next to the log files, only matching entries are read.
+    The latest **limit** matching entries are returned (oldest first).
+    """
+    texts = None
+    if plant_id is not None:
+        plant_conf = plants_configuration.get(plant_id)
+        texts = [plant_id, plant_conf.plant] if plant_conf else [plant_id]
+
+    entries = deque(search_log(
+        get_log_file_path(app_type),
+        start=start.timestamp() if start else None,
+        end=end.timestamp() if end else None,
+        min_level=logging.getLevelName(level.value) if level else logging.NOTSET,
+        tag=tag,
+        texts=texts
+    ), maxlen=limit)
+    return [LogEntry(ts=datetime.fromtimestamp(entry['ts']).isoformat(timespec='seconds'), level=entry['level'], tag=entry['tag'], entry=entry['entry']) for entry in entries]
 
 
 @app.get("/water-system/job", tags=["app"]) 
@@ -116,8 +207,16 @@ def pause_or_resume_water_system(response: Response, state: bool = FastAPIQuery(
      
 
 @app.get("/plants/configuration", response_model=List[PlantConfiguration], response_model_exclude_unset=True, tags=["plants configuration"])
-def get_all_plants_configurations():
-    """ Get all plants configurations as list """
+def get_all_plants_configurations(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None)
+):
+    """ Get all plants configurations as list (`304 Not Modified` if the configurations have not changed since `If-None-Match` / `If-Modified-Since`) """
+    headers = data_version_headers(plants_configuration.data_version)
+    if is_not_modified(plants_configuration.data_version, headers, if_none_match, if_modified_since):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
     return plants_configuration.all()
 
 
@@ -129,7 +228,7 @@ def update_plant_configuration(
     """ Updates an existing plant configuration"""
     if (plant_conf.id is not None and plant_id != plant_conf.id):
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR , detail="Forbidden to change id")
-    plants_update_ids = plants_configuration.update(plant_conf.dict(exclude_none=True), where('id') == plant_id)
+    plants_update_ids = plants_configuration.update(plant_id, plant_conf.dict(exclude_none=True))
     if (len(plants_update_ids) == 0):
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR , detail="No plant found for updating")
 
@@ -142,14 +241,14 @@ def add_plant_configuration(plant_conf: PlantConfiguration = Body(..., title="ne
     Note: **uuid** for newly created plant configuration is **generated on server side**. The Response contains the new plant configuration including generated uuid.
     """
     plant_conf.id = uuid.uuid4().hex # generate uniqe id on server side
-    plants_configuration.insert(plant_conf.dict(exclude_none=True))
+    plants_configuration.insert(plant_conf)
     return plant_conf
 
 
 @app.delete("/plants/configuration/{plant_id}", tags=["plants configuration"])
 def delete_plant_configuration(plant_id: str = Path(..., title="ID of plant configuration to delete")):
     """ Delete an existing plant configuration """
-    plants_delete_ids = plants_configuration.remove(where('id') == plant_id)
+    plants_delete_ids = plants_configuration.remove(plant_id)
     if (len(plants_delete_ids) == 0):
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR , detail="Not plant found for deleting")
 
@@ -157,7 +256,13 @@ def delete_plant_configuration(plant_id: str = Path(..., title="ID of plant conf
 @app.get("/plants/history", response_model=List[PlantSensorEntry], response_model_exclude_unset=True, tags=["plants history"])
 def get_plant_history(
     range_start_date: Optional[str] = FastAPIQuery(None, description="Note: start date is assumed to be in ISO format (YYYY-MM-DD)",regex="^([0-9]{4})(-)(1[0-2]|0[1-9])\\2(3[01]|0[1-9]|[12][0-9])$"),
-    range_end_date: Optional[str]= FastAPIQuery(None, description="Note: end date is assumed to be in ISO format (YYYY-MM-DD)", regex="^([0-9]{4})(-)(1[0-2]|0[1-9])\\2(3[01]|0[1-9]|[12][0-9])$")
+    range_end_date: Optional[str]= FastAPIQuery(None, description="Note: end date is assumed to be in ISO format (YYYY-MM-DD)", regex="^([0-9]{4})(-)(1[0-2]|0[1-9])\\2(3[01]|0[1-9]|[12][0-9])$"),
+    stream: bool = FastAPIQuery(False, description="Stream entries as newline delimited json (`application/x-ndjson`)"),
+    limit: Optional[int] = FastAPIQuery(None, ge=1, le=MAX_HISTORY_PAGE_SIZE, description="Max number of entries per page"),
+    cursor: Optional[str] = FastAPIQuery(None, description="Cursor of the next page (`X-Next-Cursor` header of the previous page)"),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None)
 ):
     """ 
     Get entries of plant sensor history db.
@@ -167,37 +272,257 @@ def get_plant_history(
     - **range_start_date**: Gets all entries which are newer than range_start_date
     - **range_end_date**: Gets all entries which are older than range_end_date
     - **NO QUERY PARAM**: Gets all entries of sensor history db
+
+    With **stream** (or `Accept: application/x-ndjson`) the entries are streamed one per line (sorted by time stamp) as they are read from the db.
+
+    With **limit** and/or **cursor** the entries are paged (sorted by time stamp). 
+    The cursor of the next page is returned in the `X-Next-Cursor` header, which is missing on the last page.
+
+    Stored entries were validated when they were persisted, so they are returned as stored (without re-validation by the response model).
+
+    Responses carry the `ETag` and `Last-Modified` of the sensor history db - `304 Not Modified` is returned if it has not changed since `If-None-Match` / `If-Modified-Since`.
+    """
+    headers = data_version_headers(sensor_history.data_version)
+    if is_not_modified(sensor_history.data_version, headers, if_none_match, if_modified_since):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if limit is not None or cursor is not None:
+        after = decode_history_cursor(cursor) if cursor else None
+        raw_entries, next_key = sensor_history.raw_page(*to_history_range(range_start_date, range_end_date), after, limit or DEFAULT_HISTORY_PAGE_SIZE)
+        if next_key is not None:
+            headers[NEXT_CURSOR_HEADER] = encode_history_cursor(next_key)
+        return raw_json_array_response(raw_entries, headers)
+    raw_entries = sensor_history.iter_raw_range(*to_history_range(range_start_date, range_end_date))
+    if stream or (accept is not None and NDJSON_MEDIA_TYPE in accept):
+        return StreamingResponse((raw_entry + b'\n' for raw_entry in raw_entries), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+    return raw_json_array_response(raw_entries, headers)
+
+
+@app.get("/plants/latest", response_model=PlantSensorEntry, response_model_exclude_unset=True, tags=["plants history"])
+def get_latest_plant_history_entry(
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None)
+):
+    """ Get the latest entry of plant sensor history db (current state of all plants) - conditional requests and response as for **/plants/history** """
+    headers = data_version_headers(sensor_history.data_version)
+    if is_not_modified(sensor_history.data_version, headers, if_none_match, if_modified_since):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    latest_entry = sensor_history.latest()
+    if latest_entry is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No plant history entry found")
+    return Response(json.dumps(latest_entry, ensure_ascii=False, separators=(',', ':')), media_type=JSON_MEDIA_TYPE, headers=headers)
+
+
+@app.get("/plants/reading/{plant_id}", response_model=Plant, response_model_exclude_unset=True, tags=["plants history"])
+def get_plant_reading(
+    plant_id: str = Path(..., title="ID of plant to read sensor values"),
+    max_age_sec: int = FastAPIQuery(DEFAULT_MIFLORA_READING_TTL_SEC, ge=0, description="Max age of a cached reading in seconds")
+):
+    """
+    Get current sensor values of a plant with Mi Flora sensor.
+
+    Readings of the sensor which are younger than **max_age_sec** are shared with the sensor job instead of polling the sensor again.
+    """
+    plant_conf = plants_configuration.get(plant_id)
+    if plant_conf is None or not plant_conf.mac_adress:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No plant with Mi Flora sensor found")
+    reading = miflora_poller_pool.read(plant_conf.mac_adress, max_age_sec)
+    return Plant(
+        id=plant_conf.id,
+        name=plant_conf.plant,
+        moisture=reading.moisture,
+        conductivity=reading.conductivity,
+        sunlight=reading.sunlight,
+        temperature=reading.temperature,
+        batteryLevel=reading.battery_level)
+
+
+@app.get("/plants/history/rollup", response_model=List[PlantSensorRollup], response_model_exclude_unset=True, tags=["plants history"])
+def get_plant_history_rollup(
+    resolution: RollupResolution = FastAPIQuery(RollupResolution.hour, title="RollupResolution", description="Period of rollups: `hour` OR `day`"),
+    plant_id: Optional[str] = FastAPIQuery(None, description="ID of plant to get rollups for (all plants by default)"),
+    range_start_date: Optional[str] = FastAPIQuery(None, description="Note: start date is assumed to be in ISO format (YYYY-MM-DD)",regex="^([0-9]{4})(-)(1[0-2]|0[1-9])\\2(3[01]|0[1-9]|[12][0-9])$"),
+    range_end_date: Optional[str]= FastAPIQuery(None, description="Note: end date is assumed to be in ISO format (YYYY-MM-DD)", regex="^([0-9]{4})(-)(1[0-2]|0[1-9])\\2(3[01]|0[1-9]|[12][0-9])$")
+):
+    """
+    Get hourly or daily rollups (min, max, mean and count) of moisture, conductivity, temperature, humidity and light per plant.
+
+    Rollups are maintained incrementally on every sensor history entry. The rollup of the current period is included.
+    Date range query params work as for **/plants/history**.
+
+    Note: temperature and light are the values of the Mi Flora sensor of a plant - otherwise the ambient values are used
+    """
+    return sensor_history_rollups[resolution].range(*to_history_range(range_start_date, range_end_date), plant_id)
+
+
+@app.get("/plants/history/export", tags=["plants history"])
+def export_plant_history(
+    export_format: ExportFormat = FastAPIQuery(ExportFormat.csv, alias="format", description="Format of the exported file: `csv`, `parquet` OR `arrow` (Arrow IPC file)"),
+    range_start_date: Optional[str] = FastAPIQuery(None, description="Note: start date is assumed to be in ISO format (YYYY-MM-DD)",regex="^([0-9]{4})(-)(1[0-2]|0[1-9])\\2(3[01]|0[1-9]|[12][0-9])$"),
+    range_end_date: Optional[str]= FastAPIQuery(None, description="Note: end date is assumed to be in ISO format (YYYY-MM-DD)", regex="^([0-9]{4})(-)(1[0-2]|0[1-9])\\2(3[01]|0[1-9]|[12][0-9])$")
+):
+    """
+    Export entries of plant sensor history db as file with one row per time stamp and plant (e.g. for pandas).
+
+    The file is streamed while the entries are read from the db. Date range query params work as for **/plants/history**.
+
+    Note: `parquet` and `arrow` require pyarrow on the server
+    """
+    if not is_export_format_available(export_format):
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=f"Export format {export_format.value} is not available (pyarrow is not installed)")
+    chunks = iter_export(sensor_history, export_format, *to_history_range(range_start_date, range_end_date))
+    file_name = f'sensor_history.{export_format.value}'
+    return StreamingResponse(chunks, media_type=EXPORT_MEDIA_TYPES[export_format], headers={'Content-Disposition': f'attachment; filename="{file_name}"'})
+
+
+@app.get("/tank/level", response_model=TankLevelEntry, tags=["tank"])
+def get_tank_level():
+    """
+    Get the latest measured water level of the tank (in %) and distance of the ultrasonic ranger to the water surface (in cm).
+
+    Note: water pumps are not started while the water level is below `min_tank_level` of jobs configuration
+    """
+    latest_entry = tank_level_history.latest()
+    if latest_entry is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No tank level entry found")
+    return latest_entry
+
+
+@app.get("/tank/history", response_model=List[TankLevelEntry], tags=["tank"])
+def get_tank_level_history(
+    range_start_date: Optional[str] = FastAPIQuery(None, description="Note: start date is assumed to be in ISO format (YYYY-MM-DD)",regex="^([0-9]{4})(-)(1[0-2]|0[1-9])\\2(3[01]|0[1-9]|[12][0-9])$"),
+    range_end_date: Optional[str]= FastAPIQuery(None, description="Note: end date is assumed to be in ISO format (YYYY-MM-DD)", regex="^([0-9]{4})(-)(1[0-2]|0[1-9])\\2(3[01]|0[1-9]|[12][0-9])$")
+):
+    """
+    Get measured water levels of the tank (sorted by time stamp).
+    Date range query params work as for **/plants/history**.
+    """
+    return tank_level_history.range(*to_history_range(range_start_date, range_end_date))
+
+
+@app.get("/pictures", response_model=List[Picture], tags=["pictures"])
+def get_pictures():
+    """ Get all pictures of the Pi Camera (latest first) """
+    return picture_pipeline.list_pictures()
+
+
+@app.post("/pictures", status_code=status.HTTP_202_ACCEPTED, tags=["pictures"])
+def take_picture():
+    """ Take a picture with the Pi Camera - the picture is listed as soon as it is captured and processed """
+    picture_pipeline.request_capture()
+    return {"message": "Picture requested"}
+
+
+@app.get("/pictures/{name}", response_class=FileResponse, tags=["pictures"])
+def get_picture(
+    name: str = Path(..., description="Name of picture"),
+    thumbnail: bool = FastAPIQuery(False, description="Get the downscaled thumbnail of the picture"),
+    if_none_match: Optional[str] = Header(None),
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_range: Optional[str] = Header(None)
+):
     """
-    history_entry = Query()
-    if range_start_date and range_end_date:
-        return sensor_history.search(history_entry.ts.test(test_history_range, range_start_date, range_end_date))
-    elif range_start_date:
-        return sensor_history.search(history_entry.ts.test(test_history_range_start, range_start_date))
-    elif range_end_date:
-        return sensor_history.search(history_entry.ts.test(test_history_range_end, range_end_date))
-    else:
-        return sensor_history.all()
+    Get a picture (JPEG) or its thumbnail.
 
+    Supports conditional requests (`ETag` / `If-None-Match`) and single byte ranges (`Range`).
+    """
+    path = picture_pipeline.picture_path(name, thumbnail)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Picture not found")
+    return file_response(path, PICTURE_MEDIA_TYPE, PICTURE_CACHE_CONTROL, if_none_match, range_header, if_range)
 
 
 ####################
 # helper functions #
 ####################
 
-def test_history_range(val: str, start: str, end: str) -> bool:
-    return datetime.fromisoformat(val).date() > date.fromisoformat(start) and datetime.fromisoformat(val).date() < date.fromisoformat(end)
+def to_history_range(start: Optional[str], end: Optional[str]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """ convert the (exclusive) start and end dates of a history query to a time stamp range start <= ts < end """
+    range_start = datetime.combine(date.fromisoformat(start) + timedelta(days=1), time.min) if start else None
+    range_end = datetime.combine(date.fromisoformat(end), time.min) if end else None
+    return range_start, range_end
 
-def test_history_range_start(val: str, start: str) -> bool:
-    return datetime.fromisoformat(val).date() > date.fromisoformat(start)
+def encode_history_cursor(key: Tuple[int, int]) -> str:
+    """ encode key (epoch seconds, doc_id) of the last entry of a page as opaque cursor """
+    return base64.urlsafe_b64encode(f'{key[0]}:{key[1]}'.encode()).decode()
 
-def test_history_range_end(val: str, end: str) -> bool:
-    return datetime.fromisoformat(val).date() < date.fromisoformat(end)
-
-def get_log_fragment(nmb_lines: int, log_file_path: str) -> str:
-    log_fragment = ''
-    with open(log_file_path) as file:
-        for line in (file.readlines() [-nmb_lines:]): 
-            log_fragment = log_fragment + line
-    return log_fragment
+def decode_history_cursor(cursor: str) -> Tuple[int, int]:
+    try:
+        epoch_seconds, doc_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(':')
+        return int(epoch_seconds), int(doc_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
 
+def get_log_file_path(app_type: AppType) -> str:
+    if app_type is AppType.api:
+        return '../log/api.log'
+    return '../log/water_system.log'
 
+def get_log_fragment(nmb_lines: int, log_file_path: str) -> str:
+    return ''.join(tail_lines(log_file_path, nmb_lines))
+
+def to_server_sent_event(line: str) -> str:
+    return 'data: ' + line.rstrip('\n') + '\n\n'
+
+def raw_json_array_response(raw_entries: Iterable[bytes], headers: dict) -> Response:
+    """ json array of already encoded entries - skips validation and encoding by the response model of the endpoint """
+    return Response(b'[' + b','.join(raw_entries) + b']', media_type=JSON_MEDIA_TYPE, headers=headers)
+
+def data_version_headers(data_version: DataVersion) -> dict:
+    """ ETag and Last-Modified of the data version of a table """
+    etag, modified_at = data_version.get()
+    return {'ETag': etag, 'Last-Modified': formatdate(modified_at, usegmt=True), 'Cache-Control': DATA_CACHE_CONTROL}
+
+def is_not_modified(data_version: DataVersion, headers: dict, if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+    """ check whether the copy of the client is still valid (If-Modified-Since is only used without If-None-Match) """
+    if if_none_match is not None:
+        return etag_matches(headers['ETag'], if_none_match)
+    if if_modified_since is not None:
+        try:
+            return not data_version.is_modified_since(parsedate_to_datetime(if_modified_since).timestamp())
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    """ weak comparison of If-None-Match (a weak and a strong ETag of the same value match) """
+    opaque_tag = etag[2:] if etag.startswith('W/') else etag
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or opaque_tag in tags or f'W/{opaque_tag}' in tags
+
+def file_response(path: str, media_type: str, cache_control: str, if_none_match: Optional[str], range_header: Optional[str], if_range: Optional[str]) -> Response:
+    """ response of a file with ETag (304 Not Modified if it matches If-None-Match) and a single byte range (206 Partial Content) """
+    stat = os.stat(path)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    headers = {'ETag': etag, 'Last-Modified': formatdate(stat.st_mtime, usegmt=True), 'Cache-Control': cache_control, 'Accept-Ranges': 'bytes'}
+
+    if if_none_match is not None and etag_matches(etag, if_none_match):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if range_header is not None and (if_range is None or if_range.strip() == etag):
+        byte_range = parse_byte_range(range_header, stat.st_size)
+        if byte_range is None:
+            return Response(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, headers={**headers, 'Content-Range': f'bytes */{stat.st_size}'})
+        start, end = byte_range
+        with open(path, 'rb') as file:
+            file.seek(start)
+            content = file.read(end - start + 1)
+        return Response(content, status_code=status.HTTP_206_PARTIAL_CONTENT, media_type=media_type, headers={**headers, 'Content-Range': f'bytes {start}-{end}/{stat.st_size}'})
+
+    return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat)
+
+def parse_byte_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """ parse a single byte range (`bytes=start-end`, `bytes=start-` or `bytes=-suffix`) to inclusive (start, end) - None if not satisfiable """
+    unit, _, byte_range = range_header.partition('=')
+    if unit.strip() != 'bytes' or ',' in byte_range:
+        return None
+    start, _, end = byte_range.strip().partition('-')
+    try:
+        if start:
+            start, end = int(start), min(int(end), size - 1) if end else size - 1
+        else:
+            start, end = max(0, size - int(end)), size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        return None
+    return start, end
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder
+from starlette.types import Message, Receive, Scope, Send
+
+COMPRESSIBLE_MEDIA_TYPES = ('application/json', 'application/x-ndjson')
+
+
+class JsonGZipMiddleware(GZipMiddleware):
+    """
+    GZip compression of json responses (`application/json`, `application/x-ndjson`) larger than `minimum_size`.
+
+    Other responses are passed through uncompressed - pictures are compressed already,
+    partial content must not be compressed and server sent events would be buffered by the compressor.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and "gzip" in Headers(scope=scope).get("Accept-Encoding", ""):
+            responder = _JsonGZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)
+            await responder(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+class _JsonGZipResponder(GZipResponder):
+
+    async def send_with_gzip(self, message: Message) -> None:
+        await super().send_with_gzip(message)
+        if message["type"] == "http.response.start":
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            if not content_type.startswith(COMPRESSIBLE_MEDIA_TYPES):
+                # passed through like a response which is encoded already
+                self.content_encoding_set = True
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+import uuid
+from typing import Tuple
+
+# changes on every start, so versions of different runs are never mistaken for each other
+_EPOCH = uuid.uuid4().hex[:8]
+
+
+class DataVersion(object):
+    """
+    Monotonic version of the data of a table, bumped on every insert, update or remove.
+
+    The version is kept in memory only (it starts again at 0 on every start), so its ETag includes an epoch of the run.
+    The ETag is weak - the same version is served gzip compressed or uncompressed, which are not byte-identical.
+    The time of the last change is the time of the start if nothing has changed since.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = 0
+        self._modified_at = time.time()
+        self._changes_in_second = 1  # changes (or start) within the second of the last change
+
+    def bump(self) -> None:
+        with self._lock:
+            self._version += 1
+            now = time.time()
+            self._changes_in_second = self._changes_in_second + 1 if int(now) == int(self._modified_at) else 1
+            self._modified_at = now
+
+    def get(self) -> Tuple[str, float]:
+        """ ETag of the version and time of the last change (epoch seconds) """
+        with self._lock:
+            return f'W/"{_EPOCH}-{self._version:x}"', self._modified_at
+
+    def is_modified_since(self, since: float) -> bool:
+        """
+        check whether the data changed after the time of an HTTP date (whole epoch seconds, e.g. If-Modified-Since)
+        Note: the data is taken as modified if it changed several times within that second, as the copy of the client
+        might have been read between these changes
+        """
+        with self._lock:
+            changed_second = int(self._modified_at)
+            return changed_second > since or (changed_second == since and self._changes_in_second > 1)
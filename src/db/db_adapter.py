@@ -1,20 +1,91 @@
 #!/usr/bin/env python3
-from tinydb import TinyDB
+from typing import Dict
+
+from tinydb import TinyDB, JSONStorage
+from tinydb.middlewares import CachingMiddleware
+
+from src.db.sensor_history_storage import SensorHistoryStorage, TinyDbSensorHistory
+from src.db.segmented_sensor_history import SegmentedSensorHistory, PARTITION_DAY, PARTITION_MONTH, PARTITION_YEAR
+from src.db.sensor_history_rollup import SensorHistoryRollup
+from src.db.plant_configuration_cache import PlantConfigurationCache
+from src.db.storage_writer import StorageWriter
+from src.model.rollup_resolution import RollupResolution
 
 SENSOR_HISTORY_TABLE_NAME = 'sensor_history'
 PLANTS_CONFIGURATION_TABLE_NAME = 'plants_configuration'
 SCHEDULED_JOBS_CONFIGURATION_TABLE_NAME = 'jobs_configuration'
 
+# sensor history storage backends
+SENSOR_HISTORY_STORAGE_TINYDB = 'tinydb'
+SENSOR_HISTORY_STORAGE_SEGMENTED = 'segmented'
+
 class DbAdapter(object):
     """ Database adapter to create a singelton TinyDB instance / connection """
     _instance = None
     _plant_db_path = '../db/plant_history.json'
     _master_data_db_path = '../db/master_data.json'
+    _sensor_history_storage = SENSOR_HISTORY_STORAGE_SEGMENTED
+    _sensor_history_path = '../db/sensor_history'
+    _sensor_history_partition = PARTITION_DAY
+    _hourly_rollup_path = '../db/sensor_history_hourly'
+    _daily_rollup_path = '../db/sensor_history_daily'
+    _tank_level_history_path = '../db/tank_level_history'
 
     def __new__(cls, *args, **kwargs):
         if not isinstance(cls._instance, cls):
             cls._instance = object.__new__(cls, *args, **kwargs)
-            cls.plant_db = TinyDB(DbAdapter._plant_db_path)
+            # all db files are written by the storage writer thread - TinyDB changes of the plant db are cached in memory
+            # and written once per batch of mutations. The master data db is not cached: its jobs configuration is edited
+            # by hand, so it is read on every access and writes never overwrite the file with an outdated copy
+            cls.storage_writer = StorageWriter()
+            cls.plant_db = TinyDB(DbAdapter._plant_db_path, storage=CachingMiddleware(JSONStorage))
             cls.master_data_db = TinyDB(DbAdapter._master_data_db_path)
+            cls.plant_configurations = PlantConfigurationCache(cls.master_data_db.table(PLANTS_CONFIGURATION_TABLE_NAME), cls.storage_writer)
+            cls.sensor_history = DbAdapter.__create_sensor_history(cls.plant_db)
+            cls.sensor_history_rollups = DbAdapter.__create_sensor_history_rollups(cls.sensor_history)
+            cls.tank_level_history = SegmentedSensorHistory(DbAdapter._tank_level_history_path, PARTITION_MONTH)
+
+            cls.sensor_history.attach_writer(cls.storage_writer)
+            cls.tank_level_history.attach_writer(cls.storage_writer)
+            for sensor_history_rollup in cls.sensor_history_rollups.values():
+                sensor_history_rollup.storage.attach_writer(cls.storage_writer)
+            cls.storage_writer.add_flush_callback(cls.plant_db.storage.flush)
         return cls._instance
 
+    @staticmethod
+    def open_sensor_history_read_only() -> SensorHistoryStorage:
+        """
+        open the configured sensor history read-only (e.g. for command line tools while the water system is running)
+        Note: no storage writer is started, no rollups are caught up and no legacy sensor history is migrated
+        """
+        if DbAdapter._sensor_history_storage == SENSOR_HISTORY_STORAGE_TINYDB:
+            return TinyDbSensorHistory(TinyDB(DbAdapter._plant_db_path, access_mode='r').table(SENSOR_HISTORY_TABLE_NAME))
+        return SegmentedSensorHistory(DbAdapter._sensor_history_path, DbAdapter._sensor_history_partition, read_only=True)
+
+    @staticmethod
+    def __create_sensor_history(plant_db: TinyDB) -> SensorHistoryStorage:
+        """ create the configured sensor history storage backend """
+        if DbAdapter._sensor_history_storage == SENSOR_HISTORY_STORAGE_TINYDB:
+            return TinyDbSensorHistory(plant_db.table(SENSOR_HISTORY_TABLE_NAME))
+
+        sensor_history = SegmentedSensorHistory(DbAdapter._sensor_history_path, DbAdapter._sensor_history_partition)
+
+        # one time migration of the legacy TinyDB sensor history into the segmented storage
+        legacy_sensor_history = plant_db.table(SENSOR_HISTORY_TABLE_NAME)
+        if len(sensor_history) == 0 and len(legacy_sensor_history) > 0:
+            sensor_history.import_documents(legacy_sensor_history.all())
+            plant_db.drop_table(SENSOR_HISTORY_TABLE_NAME)
+            plant_db.storage.flush()
+
+        return sensor_history
+
+    @staticmethod
+    def __create_sensor_history_rollups(sensor_history: SensorHistoryStorage) -> Dict[RollupResolution, SensorHistoryRollup]:
+        """ create hourly and daily rollups and catch up with sensor history entries which are not rolled up yet """
+        sensor_history_rollups = {
+            RollupResolution.hour: SensorHistoryRollup(RollupResolution.hour, SegmentedSensorHistory(DbAdapter._hourly_rollup_path, PARTITION_MONTH)),
+            RollupResolution.day: SensorHistoryRollup(RollupResolution.day, SegmentedSensorHistory(DbAdapter._daily_rollup_path, PARTITION_YEAR)),
+        }
+        for sensor_history_rollup in sensor_history_rollups.values():
+            sensor_history_rollup.catch_up(sensor_history)
+        return sensor_history_rollups
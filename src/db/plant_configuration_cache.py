@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+from typing import Dict, List, Optional, Tuple
+
+from tinydb.queries import where
+from tinydb.table import Table
+
+from src.db.data_version import DataVersion
+from src.db.storage_writer import StorageWriter
+from src.model.plant_configuration import PlantConfiguration
+
+
+class PlantConfigurationCache(object):
+    """
+    In-memory cache of the parsed plant configurations by id with write-through to the plants configuration table.
+
+    The configurations are read and parsed once (on first access or after `invalidate`) and kept in doc_id order.
+    Writes are executed by the storage writer thread, go to the TinyDB table and replace the cached snapshot,
+    so readers always see a consistent snapshot. The data version is bumped after every change of the snapshot.
+
+    Args:
+        table(Table): TinyDB table of the plants configuration
+        writer(StorageWriter): storage writer owning the db file of the table
+    """
+
+    def __init__(self, table: Table, writer: StorageWriter):
+        self._table = table
+        self._writer = writer
+        self._snapshot: Optional[Tuple[Dict[str, PlantConfiguration], Dict[str, int]]] = None  # (configurations, doc_ids) by plant id
+        self._data_version = DataVersion()
+
+    @property
+    def data_version(self) -> DataVersion:
+        return self._data_version
+
+    def all(self) -> List[PlantConfiguration]:
+        """ get all plant configurations sorted by doc_id """
+        configurations, _ = self.__get_snapshot()
+        return list(configurations.values())
+
+    def get(self, plant_id: str) -> Optional[PlantConfiguration]:
+        configurations, _ = self.__get_snapshot()
+        return configurations.get(plant_id)
+
+    def doc_id(self, plant_id: str) -> Optional[int]:
+        _, doc_ids = self.__get_snapshot()
+        return doc_ids.get(plant_id)
+
+    def insert(self, plant_conf: PlantConfiguration) -> int:
+        return self._writer.execute(self.__insert, plant_conf)
+
+    def update(self, plant_id: str, fields: dict) -> List[int]:
+        return self._writer.execute(self.__update, plant_id, fields)
+
+    def remove(self, plant_id: str) -> List[int]:
+        return self._writer.execute(self.__remove, plant_id)
+
+    def invalidate(self) -> None:
+        """ drop cached configurations - they are read again from the table on next access """
+        with self._writer.lock:
+            self._snapshot = None
+        self._data_version.bump()
+
+    def __insert(self, plant_conf: PlantConfiguration) -> int:
+        doc_id = self._table.insert(plant_conf.dict(exclude_none=True))
+        self.__update_snapshot(doc_id)
+        return doc_id
+
+    def __update(self, plant_id: str, fields: dict) -> List[int]:
+        doc_ids = self._table.update(fields, where('id') == plant_id)
+        for doc_id in doc_ids:
+            self.__update_snapshot(doc_id)
+        return doc_ids
+
+    def __remove(self, plant_id: str) -> List[int]:
+        doc_ids = self._table.remove(where('id') == plant_id)
+        if doc_ids:
+            configurations, plant_doc_ids = self.__get_snapshot()
+            self._snapshot = (
+                {id: conf for id, conf in configurations.items() if id != plant_id},
+                {id: doc_id for id, doc_id in plant_doc_ids.items() if id != plant_id}
+            )
+            self._data_version.bump()
+        return doc_ids
+
+    def __get_snapshot(self) -> Tuple[Dict[str, PlantConfiguration], Dict[str, int]]:
+        snapshot = self._snapshot
+        if snapshot is None:
+            # table is read while no batch of the writer is running
+            with self._writer.lock:
+                if self._snapshot is None:
+                    documents = sorted(self._table.all(), key=lambda document: document.doc_id)
+                    self._snapshot = (
+                        {document['id']: PlantConfiguration.parse_obj(document) for document in documents},
+                        {document['id']: document.doc_id for document in documents}
+                    )
+                snapshot = self._snapshot
+        return snapshot
+
+    def __update_snapshot(self, doc_id: int) -> None:
+        """ replace snapshot with a copy including the (re-)read configuration of the document """
+        document = self._table.get(doc_id=doc_id)
+        configurations, doc_ids = self.__get_snapshot()
+        configurations, doc_ids = dict(configurations), dict(doc_ids)
+        configurations[document['id']] = PlantConfiguration.parse_obj(document)
+        doc_ids[document['id']] = doc_id
+        self._snapshot = (
+            dict(sorted(configurations.items(), key=lambda item: doc_ids[item[0]])),
+            doc_ids
+        )
+        self._data_version.bump()
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import threading
+from bisect import bisect_left
+from datetime import datetime
+from itertools import groupby
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from tinydb.table import Document
+
+from src.db.sensor_history_storage import SensorHistoryStorage
+
+PARTITION_DAY = 'day'
+PARTITION_WEEK = 'week'
+PARTITION_MONTH = 'month'
+PARTITION_YEAR = 'year'
+
+MANIFEST_FILE_NAME = 'manifest.json'
+SEGMENT_FILE_SUFFIX = '.seg'
+ORPHANED_SEGMENT_FILE_SUFFIX = '.orphan'
+
+_PARTITION_KEY_FORMATS = {
+    PARTITION_DAY: '%Y-%m-%d',
+    PARTITION_WEEK: '%G-W%V',
+    PARTITION_MONTH: '%Y-%m',
+    PARTITION_YEAR: '%Y',
+}
+
+
+class SegmentedSensorHistory(SensorHistoryStorage):
+    """
+    Append-only sensor history backend with time partitioned segment files.
+
+    Every entry is appended as one line (`<doc_id>\\t<json>`) to the segment file of its partition (e.g. day or week of `ts`).
+    A small manifest lists the segment files and is only rewritten if a segment is added or dropped,
+    so the cost of an insert does not depend on the size of the history.
+
+    The timestamp index and the location (segment, byte offset) of every document are built on load,
+    so documents of a date range are read by seeking directly to their lines.
+
+    Args:
+        path(str): directory of the segment files and the manifest
+        partition(str): partition of the segments - `day`, `week`, `month` or `year` (an existing manifest takes precedence)
+        read_only(bool): open the history of another process (e.g. the running water system) without writing any file -
+            neither the manifest is recovered nor an incomplete last line is truncated and all mutations are refused
+    """
+
+    def __init__(self, path: str, partition: str = PARTITION_DAY, read_only: bool = False):
+        if partition not in _PARTITION_KEY_FORMATS:
+            raise ValueError(f'Unknown sensor history partition "{partition}"')
+        super().__init__()
+
+        self._path = path
+        self._manifest_path = os.path.join(path, MANIFEST_FILE_NAME)
+        self._partition = partition
+        self._segments: List[str] = []  # sorted segment keys
+        self._locations: Dict[int, Tuple[str, int]] = {}  # doc_id -> (segment key, byte offset)
+        self._last_doc_id = 0
+        self._generations: Dict[str, int] = {}  # segment key -> number of rewrites and drops (locations of readers are outdated)
+        self._lock = threading.RLock()
+        self._read_only = read_only
+
+        if not read_only:
+            os.makedirs(path, exist_ok=True)
+        self.__load()
+
+    @property
+    def partition(self) -> str:
+        return self._partition
+
+    def _insert(self, document: dict) -> int:
+        self.__check_writable()
+        with self._lock:
+            doc_id = self._last_doc_id + 1
+            self.__append(self.__segment_key(document['ts']), [(doc_id, document)])
+            self._last_doc_id = doc_id
+            self._cache_latest(document, doc_id)
+            return doc_id
+
+    def import_documents(self, documents: Iterable[dict]) -> int:
+        """ bulk import documents (e.g. from the legacy TinyDB table) - doc_ids of Documents are kept """
+        self.__check_writable()
+        with self._lock:
+            segment_lines: Dict[str, List[Tuple[int, dict]]] = {}
+            for document in documents:
+                doc_id = getattr(document, 'doc_id', None) or self._last_doc_id + 1
+                self._last_doc_id = max(self._last_doc_id, doc_id)
+                segment_lines.setdefault(self.__segment_key(document['ts']), []).append((doc_id, document))
+
+            for key, lines in segment_lines.items():
+                self.__append(key, lines)
+            self._data_version.bump()
+            return sum(len(lines) for lines in segment_lines.values())
+
+    def _remove(self, cond: Callable[[dict], bool]) -> List[int]:
+        self.__check_writable()
+        with self._lock:
+            removed_ids: List[int] = []
+            dropped_segments: List[str] = []
+
+            for key in list(self._segments):
+                kept_lines: List[Tuple[int, bytes]] = []
+                removed_in_segment = 0
+                for doc_id, _, raw in self.__read_segment(key):
+                    if cond(json.loads(raw)):
+                        removed_ids.append(doc_id)
+                        removed_in_segment += 1
+                    else:
+                        kept_lines.append((doc_id, raw))
+
+                if removed_in_segment == 0:
+                    continue
+                if len(removed_ids) == removed_in_segment:
+                    # manifest keeps the last doc_id before any document is removed - it is recovered from the
+                    # segments on load otherwise, so the doc_id of a removed last document would be reused
+                    self.__write_manifest()
+                if kept_lines:
+                    self.__rewrite_segment(key, kept_lines)
+                else:
+                    dropped_segments.append(key)
+
+            if dropped_segments:
+                for key in dropped_segments:
+                    os.remove(self.__segment_path(key))
+                    self._segments.remove(key)
+                    self.__bump_generation(key)
+                self.__write_manifest()
+
+            for doc_id in removed_ids:
+                del self._locations[doc_id]
+            self._index.remove(removed_ids)
+            return removed_ids
+
+    def _drop_before(self, end: datetime) -> List[int]:
+        """ drop whole segments of partitions before the partition of end - no segment is read or rewritten """
+        self.__check_writable()
+        with self._lock:
+            end_key = end.strftime(_PARTITION_KEY_FORMATS[self._partition])
+            dropped_segments = [key for key in self._segments if key < end_key]
+            if not dropped_segments:
+                return []
+
+            # manifest is written first - a segment file left over by a crash is never loaded again
+            self._segments = [key for key in self._segments if key >= end_key]
+            self.__write_manifest()
+            for key in dropped_segments:
+                os.remove(self.__segment_path(key))
+                self.__bump_generation(key)
+
+            dropped_keys = set(dropped_segments)
+            removed_ids = [doc_id for doc_id, (key, _) in self._locations.items() if key in dropped_keys]
+            for doc_id in removed_ids:
+                del self._locations[doc_id]
+            self._index.remove(removed_ids)
+            return removed_ids
+
+    def __iter__(self) -> Iterator[Document]:
+        """ iterate all documents segment by segment - documents inserted after the call are skipped """
+        with self._lock:
+            segments = list(self._segments)
+            last_doc_id = self._last_doc_id
+        return self.__iter_segments(segments, last_doc_id)
+
+    def __iter_segments(self, segments: List[str], last_doc_id: int) -> Iterator[Document]:
+        for key in segments:
+            segment_file = self.__open_segment(key)
+            if segment_file is None:
+                continue  # dropped in the meantime
+            with segment_file:
+                for doc_id, _, raw in self.__read_lines(segment_file):
+                    if doc_id <= last_doc_id:
+                        yield Document(json.loads(raw), doc_id)
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    def get(self, doc_id: int) -> Optional[Document]:
+        return next(self._read_documents([doc_id]), None)
+
+    def _read_raw_documents(self, doc_ids: List[int]) -> Iterator[bytes]:
+        return (raw for _, raw in self.__read_raw(doc_ids))
+
+    def _read_documents(self, doc_ids: List[int]) -> Iterator[Document]:
+        return (Document(json.loads(raw), doc_id) for doc_id, raw in self.__read_raw(doc_ids))
+
+    def __read_raw(self, doc_ids: List[int]) -> Iterator[Tuple[int, bytes]]:
+        """ read (doc_id, raw json) tuples in order of the given doc_ids """
+        with self._lock:
+            locations = [(doc_id, self._locations[doc_id]) for doc_id in doc_ids if doc_id in self._locations]
+            generations = {key: self._generations.get(key, 0) for key in {key for _, (key, _) in locations}}
+        return self.__read_located(locations, generations)
+
+    def __read_located(self, locations: List[Tuple[int, Tuple[str, int]]], generations: Dict[str, int]) -> Iterator[Tuple[int, bytes]]:
+        """
+        open one segment after another and seek to the lines of the documents
+        Note: locations of a segment which was rewritten or dropped after they were read are resolved again when
+        the segment is opened - documents removed in the meantime are skipped
+        """
+        for key, segment_locations in groupby(locations, key=lambda location: location[1][0]):
+            segment_locations = list(segment_locations)
+            with self._lock:
+                if self._generations.get(key, 0) != generations[key]:
+                    segment_locations = [(doc_id, self._locations[doc_id]) for doc_id, _ in segment_locations if doc_id in self._locations]
+                segment_file = self.__open_segment(key) if segment_locations else None
+            if segment_file is None:
+                continue
+            with segment_file:
+                for doc_id, (_, offset) in segment_locations:
+                    segment_file.seek(offset)
+                    _, _, raw = segment_file.readline().rstrip(b'\n').partition(b'\t')
+                    yield doc_id, raw
+
+
+    ###################
+    # segment helpers #
+    ###################
+
+    def __check_writable(self) -> None:
+        if self._read_only:
+            raise RuntimeError(f'Sensor history {self._path} is opened read-only')
+
+    def __segment_key(self, ts: str) -> str:
+        return datetime.fromisoformat(ts).strftime(_PARTITION_KEY_FORMATS[self._partition])
+
+    def __segment_path(self, key: str) -> str:
+        return os.path.join(self._path, key + SEGMENT_FILE_SUFFIX)
+
+    def __append(self, key: str, lines: List[Tuple[int, dict]]) -> None:
+        """ append lines to a segment, index them and register the segment in the manifest if it is new """
+        position = bisect_left(self._segments, key)
+        if position == len(self._segments) or self._segments[position] != key:
+            # manifest is written first - a segment file is never written without being listed (its doc_ids are
+            # recovered on load), so doc_ids are never issued twice after a crash between both steps
+            self._segments.insert(position, key)
+            self.__write_manifest()
+
+        with open(self.__segment_path(key), 'ab') as segment_file:
+            offset = segment_file.seek(0, os.SEEK_END)
+            for doc_id, document in lines:
+                line = f'{doc_id}\t{self.__dump(document)}\n'.encode('utf-8')
+                segment_file.write(line)
+                self._locations[doc_id] = (key, offset)
+                self._index.add(document['ts'], doc_id)
+                offset += len(line)
+
+    def __read_segment(self, key: str) -> Iterator[Tuple[int, int, bytes]]:
+        """ read (doc_id, byte offset, raw json) tuples of a segment """
+        try:
+            with open(self.__segment_path(key), 'rb') as segment_file:
+                yield from self.__read_lines(segment_file)
+        except FileNotFoundError:
+            return
+
+    @staticmethod
+    def __read_lines(segment_file: BinaryIO) -> Iterator[Tuple[int, int, bytes]]:
+        offset = 0
+        for line in segment_file:
+            doc_id, separator, raw = line.rstrip(b'\n').partition(b'\t')
+            if separator and line.endswith(b'\n'):
+                yield int(doc_id), offset, raw
+            offset += len(line)
+
+    def __open_segment(self, key: str) -> Optional[BinaryIO]:
+        """
+        open the file of a segment for a reader (None if it was dropped or its first lines were never written)
+        Note: opened holding the lock, so the file is never read while it is replaced - an open file stays readable
+        after the segment is dropped (unlink) or rewritten (replace) by a concurrent mutation
+        """
+        with self._lock:
+            if key not in self._segments:
+                return None
+            try:
+                return open(self.__segment_path(key), 'rb')
+            except FileNotFoundError:
+                return None  # listed in the manifest before a crash while its first lines were appended
+
+    def __truncate_incomplete_line(self, key: str) -> None:
+        """ truncate an incomplete last line (e.g. after power loss), so the next append starts on a new line """
+        try:
+            with open(self.__segment_path(key), 'rb+') as segment_file:
+                if segment_file.seek(0, os.SEEK_END) == 0:
+                    return
+                segment_file.seek(-1, os.SEEK_END)
+                if segment_file.read(1) != b'\n':
+                    segment_file.seek(0)
+                    segment_file.truncate(segment_file.read().rfind(b'\n') + 1)
+        except FileNotFoundError:
+            return
+
+    def __rewrite_segment(self, key: str, lines: List[Tuple[int, bytes]]) -> None:
+        tmp_path = self.__segment_path(key) + '.tmp'
+        with open(tmp_path, 'wb') as segment_file:
+            offset = 0
+            for doc_id, raw in lines:
+                line = str(doc_id).encode('utf-8') + b'\t' + raw + b'\n'
+                segment_file.write(line)
+                self._locations[doc_id] = (key, offset)
+                offset += len(line)
+        os.replace(tmp_path, self.__segment_path(key))
+        self.__bump_generation(key)
+
+    def __bump_generation(self, key: str) -> None:
+        self._generations[key] = self._generations.get(key, 0) + 1
+
+    @staticmethod
+    def __dump(document: dict) -> str:
+        return json.dumps(document, ensure_ascii=False, separators=(',', ':'))
+
+
+    ####################
+    # manifest helpers #
+    ####################
+
+    def __load(self) -> None:
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path, encoding='utf-8') as manifest_file:
+                manifest = json.load(manifest_file)
+            self._partition = manifest['partition']
+            self._segments = sorted(manifest['segments'])
+            self._last_doc_id = manifest.get('last_doc_id', 0)
+        elif os.path.isdir(self._path):  # recover manifest from existing segment files
+            self._segments = sorted(file_name[:-len(SEGMENT_FILE_SUFFIX)] for file_name in os.listdir(self._path) if file_name.endswith(SEGMENT_FILE_SUFFIX))
+            if not self._read_only:
+                self.__write_manifest()
+
+        if not self._read_only:
+            self.__set_aside_orphaned_segments()
+
+        # build timestamp index and document locations
+        for key in self._segments:
+            if not self._read_only:
+                self.__truncate_incomplete_line(key) # lines which are incomplete (written right now) are skipped by readers
+            for doc_id, offset, raw in self.__read_segment(key):
+                self._locations[doc_id] = (key, offset)
+                self._index.add(json.loads(raw)['ts'], doc_id)
+                self._last_doc_id = max(self._last_doc_id, doc_id)
+
+    def __set_aside_orphaned_segments(self) -> None:
+        """
+        rename segment files which are not listed in the manifest (left over by a crash while a segment was dropped
+        or written by an earlier version) to `<segment>.orphan` - their doc_ids are taken into account for the last doc_id,
+        so they are never issued again, and their lines never reappear by appends to a new segment of the same partition
+        """
+        listed_segments = set(self._segments)
+        orphaned_segments = [file_name[:-len(SEGMENT_FILE_SUFFIX)] for file_name in os.listdir(self._path)
+                             if file_name.endswith(SEGMENT_FILE_SUFFIX) and file_name[:-len(SEGMENT_FILE_SUFFIX)] not in listed_segments]
+        if not orphaned_segments:
+            return
+
+        for key in orphaned_segments:
+            for doc_id, _, _ in self.__read_segment(key):
+                self._last_doc_id = max(self._last_doc_id, doc_id)
+        # last doc_id is persisted before the files are renamed
+        self.__write_manifest()
+        for key in orphaned_segments:
+            os.replace(self.__segment_path(key), self.__segment_path(key) + ORPHANED_SEGMENT_FILE_SUFFIX)
+
+    def __write_manifest(self) -> None:
+        manifest = {'partition': self._partition, 'segments': self._segments, 'last_doc_id': self._last_doc_id}
+        tmp_path = self._manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as manifest_file:
+            json.dump(manifest, manifest_file)
+        os.replace(tmp_path, self._manifest_path)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Columnar export of the sensor history - one row per (ts, plant).
+
+Entries are read one after another from the sensor history and written in chunks (CSV) or record batches
+(Parquet, Arrow IPC file), so exports of years of history do not need the whole history in memory.
+Parquet and Arrow require `pyarrow`.
+
+Usage (from `src/db`, like the water system runner):
+    python3 sensor_history_export.py --format parquet --start 2021-01-01 --output sensor_history.parquet
+"""
+
+import argparse
+import csv
+import io
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from src.db.sensor_history_storage import SensorHistoryStorage
+from src.model.export_format import ExportFormat
+
+EXPORT_BATCH_ROWS = 10000 # rows per CSV chunk / record batch (row group of Parquet)
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.csv: 'text/csv',
+    ExportFormat.parquet: 'application/vnd.apache.parquet',
+    ExportFormat.arrow: 'application/vnd.apache.arrow.file',
+}
+
+# (column, key of sensor history entry, key of plant) - ambient values of the entry are repeated for every plant
+EXPORT_COLUMNS: List[Tuple[str, Optional[str], Optional[str]]] = [
+    ('ts', 'ts', None),
+    ('temperature', 'temperature', None),
+    ('humidity', 'humidity', None),
+    ('visible_light', 'visible_light', None),
+    ('UV_index', 'UV_index', None),
+    ('IR_light', 'IR_light', None),
+    ('plant_id', None, 'id'),
+    ('plant_name', None, 'name'),
+    ('moisture', None, 'moisture'),
+    ('conductivity', None, 'conductivity'),
+    ('sunlight', None, 'sunlight'),
+    ('plant_temperature', None, 'temperature'),
+    ('battery_level', None, 'batteryLevel'),
+]
+
+
+def __arrow_schema():
+    return pyarrow.schema([
+        ('ts', pyarrow.timestamp('s')),
+        ('temperature', pyarrow.float64()),
+        ('humidity', pyarrow.float64()),
+        ('visible_light', pyarrow.int64()),
+        ('UV_index', pyarrow.float64()),
+        ('IR_light', pyarrow.int64()),
+        ('plant_id', pyarrow.string()),
+        ('plant_name', pyarrow.string()),
+        ('moisture', pyarrow.int64()),
+        ('conductivity', pyarrow.int64()),
+        ('sunlight', pyarrow.int64()),
+        ('plant_temperature', pyarrow.float64()),
+        ('battery_level', pyarrow.int64()),
+    ])
+
+
+def iter_export_rows(sensor_history: SensorHistoryStorage, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Iterator[tuple]:
+    """ flattened rows (see EXPORT_COLUMNS) of all entries with start <= ts < end sorted by ts - an entry without plants results in one row without plant values """
+    for entry in sensor_history.iter_range(start, end):
+        for plant in entry.get('plants') or [{}]:
+            yield tuple(entry.get(entry_key) if entry_key is not None else plant.get(plant_key) for _, entry_key, plant_key in EXPORT_COLUMNS)
+
+
+def is_export_format_available(export_format: ExportFormat) -> bool:
+    return export_format is ExportFormat.csv or pyarrow is not None
+
+
+def iter_export(sensor_history: SensorHistoryStorage, export_format: ExportFormat, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Iterator[bytes]:
+    """ iterate the chunks of the exported file """
+    if export_format is ExportFormat.csv:
+        return __iter_csv(sensor_history, start, end)
+    if not is_export_format_available(export_format):
+        raise RuntimeError(f'Export format {export_format.value} requires pyarrow')
+    return __iter_arrow(sensor_history, export_format, start, end)
+
+
+def export_sensor_history(sensor_history: SensorHistoryStorage, path: str, export_format: ExportFormat, start: Optional[datetime] = None, end: Optional[datetime] = None) -> int:
+    """ export to a file and return its size in bytes """
+    size = 0
+    with open(path, 'wb') as export_file:
+        for chunk in iter_export(sensor_history, export_format, start, end):
+            export_file.write(chunk)
+            size += len(chunk)
+    return size
+
+
+def __iter_batches(sensor_history: SensorHistoryStorage, start: Optional[datetime], end: Optional[datetime]) -> Iterator[List[tuple]]:
+    batch = []
+    for row in iter_export_rows(sensor_history, start, end):
+        batch.append(row)
+        if len(batch) >= EXPORT_BATCH_ROWS:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def __iter_csv(sensor_history: SensorHistoryStorage, start: Optional[datetime], end: Optional[datetime]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow([column for column, _, _ in EXPORT_COLUMNS])
+    for batch in __iter_batches(sensor_history, start, end):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """ write-only file collecting the written bytes until they are taken - the writers of pyarrow write sequentially """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        chunk = b''.join(self._chunks)
+        self._chunks = []
+        return chunk
+
+
+def __iter_arrow(sensor_history: SensorHistoryStorage, export_format: ExportFormat, start: Optional[datetime], end: Optional[datetime]) -> Iterator[bytes]:
+    schema = __arrow_schema()
+    sink = _ChunkSink()
+    if export_format is ExportFormat.parquet:
+        writer = pyarrow.parquet.ParquetWriter(sink, schema, compression='zstd')
+    else:
+        writer = pyarrow.ipc.new_file(sink, schema)
+
+    for batch in __iter_batches(sensor_history, start, end):
+        columns = list(zip(*batch))
+        columns[0] = [datetime.fromisoformat(ts) for ts in columns[0]]
+        record_batch = pyarrow.record_batch([pyarrow.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema)
+        if export_format is ExportFormat.parquet:
+            writer.write_table(pyarrow.Table.from_batches([record_batch]))
+        else:
+            writer.write_batch(record_batch)
+        yield sink.take()
+
+    writer.close()
+    yield sink.take()
+
+
+def main():
+    from src.db.db_adapter import DbAdapter
+
+    parser = argparse.ArgumentParser(description='Export the sensor history with one row per (ts, plant)')
+    parser.add_argument('--format', type=ExportFormat, choices=list(ExportFormat), default=ExportFormat.csv, help='format of the exported file')
+    parser.add_argument('--start', type=datetime.fromisoformat, default=None, help='export entries with ts >= start (ISO format)')
+    parser.add_argument('--end', type=datetime.fromisoformat, default=None, help='export entries with ts < end (ISO format)')
+    parser.add_argument('--output', required=True, help='path of the exported file')
+    args = parser.parse_args()
+
+    # the db is owned by the running water system - the sensor history is only read
+    size = export_sensor_history(DbAdapter.open_sensor_history_read_only(), args.output, args.format, args.start, args.end)
+    print(f'exported sensor history to {args.output} ({size} bytes)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from src.db.sensor_history_storage import SensorHistoryStorage
+from src.db.timestamp_index import from_epoch_seconds
+from src.model.rollup_resolution import RollupResolution
+
+ROLLUP_FIELDS = ['moisture', 'conductivity', 'temperature', 'humidity', 'light']
+
+_ROLLUP_PERIODS = {
+    RollupResolution.hour: timedelta(hours=1),
+    RollupResolution.day: timedelta(days=1),
+}
+
+
+def period_start(ts: datetime, resolution: RollupResolution) -> datetime:
+    """ get start of the rollup period of a time stamp """
+    if resolution is RollupResolution.hour:
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def rollup_values(plant: dict, entry: dict) -> Dict[str, Optional[float]]:
+    """
+    get the rolled up values of a plant of a sensor history entry
+
+    temperature and light are measured per plant by Mi Flora sensors - otherwise the values of the ambient sensors are used
+    """
+    return {
+        'moisture': plant.get('moisture'),
+        'conductivity': plant.get('conductivity'),
+        'temperature': plant.get('temperature', entry.get('temperature')),
+        'humidity': entry.get('humidity'),
+        'light': plant.get('sunlight', entry.get('visible_light')),
+    }
+
+
+def merge_rollup_value(rollup_value: Optional[dict], other: dict) -> dict:
+    """ merge two rollup values (min, max, mean, count) """
+    if rollup_value is None:
+        return dict(other)
+    count = rollup_value['count'] + other['count']
+    return {
+        'min': min(rollup_value['min'], other['min']),
+        'max': max(rollup_value['max'], other['max']),
+        'mean': (rollup_value['mean'] * rollup_value['count'] + other['mean'] * other['count']) / count,
+        'count': count,
+    }
+
+
+class SensorHistoryRollup(object):
+    """
+    Incrementally maintained rollup (min, max, mean and count per plant) of the sensor history for one resolution.
+
+    Sensor history entries are added to the rollup of the current period, which is kept in memory.
+    As soon as an entry of a newer period is added, the current period is appended to the rollup storage,
+    so adding an entry never recomputes a rollup and reading rollups does not touch the raw sensor history.
+
+    Args:
+        resolution(RollupResolution): period of the rollups (hour or day)
+        storage(SensorHistoryStorage): storage of the completed rollup periods
+    """
+
+    def __init__(self, resolution: RollupResolution, storage: SensorHistoryStorage):
+        self._resolution = resolution
+        self._storage = storage
+        self._period: Optional[datetime] = None  # start of current period
+        self._plants: Dict[str, dict] = {}  # rollups of current period by plant id
+        self._lock = threading.RLock()
+
+    @property
+    def resolution(self) -> RollupResolution:
+        return self._resolution
+
+    @property
+    def storage(self) -> SensorHistoryStorage:
+        return self._storage
+
+    @property
+    def completed_until(self) -> Optional[datetime]:
+        """ start of the current period - all sensor history entries before are rolled up into the rollup storage (None if nothing is rolled up yet) """
+        with self._lock:
+            return self._period
+
+    def add_entry(self, entry: dict) -> None:
+        """ add a sensor history entry to the rollup of its period """
+        period = period_start(datetime.fromisoformat(entry['ts']), self._resolution)
+
+        with self._lock:
+            if self._period is not None and period != self._period:
+                if period < self._period:
+                    return  # period of entry is already completed
+                self.__complete_period()
+            self._period = period
+
+            for plant in entry['plants']:
+                plant_rollup = self._plants.setdefault(plant['id'], {'id': plant['id'], 'name': plant['name']})
+                for field, value in rollup_values(plant, entry).items():
+                    if value is not None:
+                        plant_rollup[field] = merge_rollup_value(plant_rollup.get(field), {'min': value, 'max': value, 'mean': value, 'count': 1})
+
+    def catch_up(self, sensor_history: SensorHistoryStorage) -> None:
+        """ add all entries of the sensor history which are newer than the last completed period (e.g. on startup) """
+        last_key = self._storage.index.last()
+        start = from_epoch_seconds(last_key[0]) + _ROLLUP_PERIODS[self._resolution] if last_key is not None else None
+        for entry in sensor_history.iter_range(start, None):
+            self.add_entry(entry)
+
+    def range(self, start: Optional[datetime] = None, end: Optional[datetime] = None, plant_id: Optional[str] = None) -> List[dict]:
+        """ get rollups of all periods with start <= period start < end (including the current period) """
+        rollups: List[dict] = list(self._storage.range(start, end))
+
+        with self._lock:
+            if self._period is not None and (start is None or self._period >= start) and (end is None or self._period < end):
+                rollups.append(self.__current_rollup())
+
+        if plant_id is not None:
+            rollups = [{'ts': rollup['ts'], 'plants': [plant for plant in rollup['plants'] if plant['id'] == plant_id]} for rollup in rollups]
+        return rollups
+
+    def __current_rollup(self) -> dict:
+        return {'ts': self._period.isoformat(timespec='seconds'), 'plants': [dict(plant) for plant in self._plants.values()]}
+
+    def __complete_period(self) -> None:
+        self._storage.insert(self.__current_rollup())
+        self._plants = {}
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+import json
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from tinydb.table import Document, Table
+
+from src.db.data_version import DataVersion
+from src.db.storage_writer import StorageWriter
+from src.db.timestamp_index import TimestampIndex
+
+
+class SensorHistoryStorage(object):
+    """
+    Base class of the sensor history storage backends.
+
+    A backend provides the subset of the TinyDB table api which is used for the sensor history
+    (`insert`, `all`, `search`, `remove`, `get` and iteration), so callers do not need to know which backend is configured.
+    Stored documents keep the shape of a `PlantSensorEntry` dict.
+
+    Backends maintain a timestamp index of all documents, which is used for date range queries,
+    and a cache of the latest document. The data version is bumped after every insert, remove or import.
+    Once a storage writer is attached, all mutations are executed by the writer thread (see `StorageWriter`).
+    """
+
+    def __init__(self):
+        self._index = TimestampIndex()
+        self._latest: Optional[Document] = None
+        self._writer: Optional[StorageWriter] = None
+        self._data_version = DataVersion()
+
+    def attach_writer(self, writer: StorageWriter) -> None:
+        """ execute all further mutations by the storage writer """
+        self._writer = writer
+
+    @property
+    def data_version(self) -> DataVersion:
+        return self._data_version
+
+    def insert(self, document: dict) -> int:
+        """ insert a document and return its doc_id """
+        doc_id = self._execute(self._insert, document)
+        self._data_version.bump()
+        return doc_id
+
+    def remove(self, cond: Callable[[dict], bool]) -> List[int]:
+        """ remove all documents matching the condition and return their doc_ids """
+        removed_ids = self._execute(self._remove, cond)
+        if removed_ids:
+            self._data_version.bump()
+        return removed_ids
+
+    def drop_before(self, end: datetime) -> List[int]:
+        """
+        remove documents with ts < end and return their doc_ids (retention)
+        Note: backends may keep documents of a partition which contains end, so they are dropped as a whole later on
+        """
+        removed_ids = self._execute(self._drop_before, end)
+        if removed_ids:
+            self._data_version.bump()
+        return removed_ids
+
+    def import_documents(self, documents: Iterable[dict]) -> int:
+        """ bulk import documents (not executed by the storage writer) and return the number of imported documents """
+        raise NotImplementedError
+
+    def _insert(self, document: dict) -> int:
+        raise NotImplementedError
+
+    def _remove(self, cond: Callable[[dict], bool]) -> List[int]:
+        raise NotImplementedError
+
+    def _drop_before(self, end: datetime) -> List[int]:
+        return self._remove(lambda document: datetime.fromisoformat(document['ts']) < end)
+
+    def __iter__(self) -> Iterator[Document]:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def all(self) -> List[Document]:
+        return list(iter(self))
+
+    def search(self, cond: Callable[[dict], bool]) -> List[Document]:
+        return [document for document in self if cond(document)]
+
+    def get(self, doc_id: int) -> Optional[Document]:
+        for document in self:
+            if document.doc_id == doc_id:
+                return document
+        return None
+
+    @property
+    def index(self) -> TimestampIndex:
+        return self._index
+
+    def latest(self) -> Optional[Document]:
+        """ get the latest document (by ts) - cached on insert or read once from the tail of the index """
+        last_key = self._index.last()
+        if last_key is None:
+            return None
+        latest = self._latest
+        if latest is None or latest.doc_id != last_key[1]:
+            latest = self._latest = self.get(last_key[1])
+        return latest
+
+    def range(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[Document]:
+        """ get all documents with start <= ts < end sorted by ts """
+        return list(self.iter_range(start, end))
+
+    def iter_range(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Iterator[Document]:
+        return self._read_documents(self._index.range(start, end))
+
+    def page(self, start: Optional[datetime] = None, end: Optional[datetime] = None, after: Optional[Tuple[int, int]] = None, limit: int = 100) -> Tuple[List[Document], Optional[Tuple[int, int]]]:
+        """ get the next page of documents with start <= ts < end sorted by ts and the key to request the following page (see `TimestampIndex.page`) """
+        doc_ids, next_key = self._index.page(start, end, after, limit)
+        return list(self._read_documents(doc_ids)), next_key
+
+    def iter_raw_range(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Iterator[bytes]:
+        """ iterate json encoded documents with start <= ts < end sorted by ts """
+        return self._read_raw_documents(self._index.range(start, end))
+
+    def raw_page(self, start: Optional[datetime] = None, end: Optional[datetime] = None, after: Optional[Tuple[int, int]] = None, limit: int = 100) -> Tuple[List[bytes], Optional[Tuple[int, int]]]:
+        """ get the next page of json encoded documents (see `page`) """
+        doc_ids, next_key = self._index.page(start, end, after, limit)
+        return list(self._read_raw_documents(doc_ids)), next_key
+
+    def _execute(self, mutation: Callable, *args):
+        if self._writer is None:
+            return mutation(*args)
+        return self._writer.execute(mutation, *args)
+
+    def _cache_latest(self, document: dict, doc_id: int) -> None:
+        """ cache an inserted document if it is the latest one """
+        last_key = self._index.last()
+        if last_key is not None and last_key[1] == doc_id:
+            self._latest = Document(document, doc_id)
+
+    def _read_raw_documents(self, doc_ids: List[int]) -> Iterator[bytes]:
+        """ read json encoded documents in order of the given doc_ids - backends storing json should override this to skip decoding """
+        return (json.dumps(document, ensure_ascii=False, separators=(',', ':')).encode('utf-8') for document in self._read_documents(doc_ids))
+
+    def _read_documents(self, doc_ids: List[int]) -> Iterator[Document]:
+        """ read documents in order of the given doc_ids - backends should override this with a direct lookup """
+        positions = {doc_id: position for position, doc_id in enumerate(doc_ids)}
+        documents: List[Optional[Document]] = [None] * len(doc_ids)
+        for document in self:
+            position = positions.get(document.doc_id)
+            if position is not None:
+                documents[position] = document
+        return (document for document in documents if document is not None)
+
+
+class TinyDbSensorHistory(SensorHistoryStorage):
+    """
+    Sensor history backend storing all entries in a single TinyDB table.
+
+    Note: TinyDB rewrites the whole json file on every insert, so insert cost grows with the size of the history.
+
+    Args:
+        table(Table): TinyDB table of the sensor history
+    """
+
+    def __init__(self, table: Table):
+        super().__init__()
+        self._table = table
+        for document in table:
+            self._index.add(document['ts'], document.doc_id)
+
+    def _insert(self, document: dict) -> int:
+        doc_id = self._table.insert(document)
+        self._index.add(document['ts'], doc_id)
+        self._cache_latest(document, doc_id)
+        return doc_id
+
+    def import_documents(self, documents: Iterable[dict]) -> int:
+        documents = list(documents)
+        doc_ids = self._table.insert_multiple(documents)
+        for document, doc_id in zip(documents, doc_ids):
+            self._index.add(document['ts'], doc_id)
+        self._data_version.bump()
+        return len(doc_ids)
+
+    def _remove(self, cond: Callable[[dict], bool]) -> List[int]:
+        removed_ids = self._table.remove(cond)
+        self._index.remove(removed_ids)
+        return removed_ids
+
+    def _drop_before(self, end: datetime) -> List[int]:
+        doc_ids = self._index.range(None, end)
+        if not doc_ids:
+            return []
+        removed_ids = self._table.remove(doc_ids=doc_ids)
+        self._index.remove(removed_ids)
+        return removed_ids
+
+    def __iter__(self) -> Iterator[Document]:
+        """ iterate the documents as of the call - they are copied holding the lock of the writer """
+        with self.__read_lock():
+            return iter(self._table.all())
+
+    def __len__(self) -> int:
+        with self.__read_lock():
+            return len(self._table)
+
+    def all(self) -> List[Document]:
+        with self.__read_lock():
+            return self._table.all()
+
+    def search(self, cond: Callable[[dict], bool]) -> List[Document]:
+        with self.__read_lock():
+            return self._table.search(cond)
+
+    def get(self, doc_id: int) -> Optional[Document]:
+        with self.__read_lock():
+            return self._table.get(doc_id=doc_id)
+
+    def __read_lock(self):
+        """ lock of the storage writer - the table is read from the cache of the CachingMiddleware, which is changed by the writer thread """
+        return self._writer.lock if self._writer is not None else nullcontext()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, List
+
+logger = logging.getLogger('water.system')
+
+MAX_BATCH_SIZE = 100
+
+
+class StorageWriter(object):
+    """
+    Single writer thread which owns all db files.
+
+    Mutations are submitted to a queue and executed by the writer thread one after another. All mutations which
+    are queued at the same time are executed as one batch followed by one flush of the storages (flush callbacks),
+    so concurrent writes of api and scheduler jobs never interleave and share the cost of writing the files.
+
+    Readers which need a consistent view of a TinyDB storage hold `lock`, which is held by the writer thread
+    while a batch is executed and flushed. Readers must not submit mutations while holding the lock.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._queue: queue.Queue = queue.Queue()
+        self._flush_callbacks: List[Callable[[], None]] = []
+        self._thread = threading.Thread(target=self.__run, name='storage_writer', daemon=True)
+        self._thread.start()
+
+    def add_flush_callback(self, flush: Callable[[], None]) -> None:
+        """ add callback to flush a storage after each batch """
+        self._flush_callbacks.append(flush)
+
+    def submit(self, mutation: Callable[..., Any], *args, **kwargs) -> Future:
+        """ queue a mutation - the future is resolved after the batch of the mutation has been flushed """
+        future: Future = Future()
+        self._queue.put((future, mutation, args, kwargs))
+        return future
+
+    def execute(self, mutation: Callable[..., Any], *args, **kwargs) -> Any:
+        """ queue a mutation and wait for its result """
+        if threading.current_thread() is self._thread: # nested mutation of a batch
+            return mutation(*args, **kwargs)
+        return self.submit(mutation, *args, **kwargs).result()
+
+    def __run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < MAX_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            results = []
+            with self.lock:
+                for future, mutation, args, kwargs in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        results.append((future, mutation(*args, **kwargs), None))
+                    except BaseException as exception:
+                        results.append((future, None, exception))
+
+                flush_exception = None
+                for flush in self._flush_callbacks:
+                    try:
+                        flush()
+                    except BaseException as exception:
+                        logger.error(f'Flushing storage failed: {exception}')
+                        flush_exception = exception
+
+            for future, result, exception in results:
+                exception = exception or flush_exception
+                if exception is not None:
+                    future.set_exception(exception)
+                else:
+                    future.set_result(result)
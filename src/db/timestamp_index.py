@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+import calendar
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch_seconds(ts: datetime) -> int:
+    """ convert a time stamp to epoch seconds (naive time stamps are taken as they are, without time zone conversion) """
+    return calendar.timegm(ts.utctimetuple())
+
+
+def from_epoch_seconds(epoch_seconds: int) -> datetime:
+    """ convert epoch seconds back to a (naive) time stamp - inverse of `to_epoch_seconds` """
+    return _EPOCH + timedelta(seconds=epoch_seconds)
+
+
+class TimestampIndex(object):
+    """
+    Sorted index of (epoch seconds, doc_id) keys of time stamped documents.
+
+    Range queries are a bisect plus a slice of the sorted keys, so they do not touch documents outside of the range.
+    Documents are mostly inserted in time order, which makes adding a key an append in the common case.
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple[int, int]] = []
+
+    def add(self, ts: str, doc_id: int) -> None:
+        """ add key of a document by its iso formatted time stamp """
+        key = (to_epoch_seconds(datetime.fromisoformat(ts)), doc_id)
+        if not self._keys or key > self._keys[-1]:
+            self._keys.append(key)
+        else:
+            insort(self._keys, key)
+
+    def remove(self, doc_ids: Iterable[int]) -> None:
+        removed_ids = set(doc_ids)
+        if removed_ids:
+            self._keys = [key for key in self._keys if key[1] not in removed_ids]
+
+    def range(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[int]:
+        """ get doc_ids of documents with start <= ts < end sorted by ts """
+        keys = self._keys
+        low = 0 if start is None else bisect_left(keys, (to_epoch_seconds(start), 0))
+        high = len(keys) if end is None else bisect_left(keys, (to_epoch_seconds(end), 0))
+        return [doc_id for _, doc_id in keys[low:high]]
+
+    def page(self, start: Optional[datetime] = None, end: Optional[datetime] = None, after: Optional[Tuple[int, int]] = None, limit: int = 100) -> Tuple[List[int], Optional[Tuple[int, int]]]:
+        """
+        get doc_ids of the next page of documents with start <= ts < end sorted by ts
+
+        Args:
+            after: key (epoch seconds, doc_id) of the last document of the previous page
+            limit: max number of doc_ids of the page
+        Returns:
+            doc_ids of the page and the key of its last document if there are more documents left (otherwise None)
+        """
+        keys = self._keys
+        low = 0 if start is None else bisect_left(keys, (to_epoch_seconds(start), 0))
+        high = len(keys) if end is None else bisect_left(keys, (to_epoch_seconds(end), 0))
+        if after is not None:
+            low = max(low, bisect_right(keys, after))
+
+        page_keys = keys[low:min(high, low + limit)]
+        next_key = page_keys[-1] if page_keys and low + limit < high else None
+        return [doc_id for _, doc_id in page_keys], next_key
+
+    def last(self) -> Optional[Tuple[int, int]]:
+        """ get key (epoch seconds, doc_id) of the newest document """
+        keys = self._keys
+        return keys[-1] if keys else None
+
+    def __len__(self) -> int:
+        return len(self._keys)
@@ -0,0 +1,107 @@
+import os
+import time
+from typing import Iterator, List, Optional
+
+from src.log.logger import LOG_BACKUP_COUNT
+
+LOG_BLOCK_SIZE = 8192
+LOG_FOLLOW_POLL_INTERVAL_SEC = 0.5
+
+
+def tail_lines(log_file_path: str, nmb_lines: int, backup_count: int = LOG_BACKUP_COUNT) -> List[str]:
+    """
+    Get the last nmb_lines lines of a log file (oldest first).
+    The file is read backwards in blocks from its end - the rotated files (.1, .2, ...) are read if more lines are requested.
+    """
+    lines: List[str] = []
+    if nmb_lines <= 0:
+        return lines
+
+    for path in [log_file_path] + [f'{log_file_path}.{number}' for number in range(1, backup_count + 1)]:
+        if not os.path.exists(path):
+            break
+        for line in __read_lines_backwards(path):
+            lines.append(line.decode('utf-8', errors='replace') + '\n')
+            if len(lines) == nmb_lines:
+                return lines[::-1]
+    return lines[::-1]
+
+
+def follow_lines(log_file_path: str, poll_interval_sec: float = LOG_FOLLOW_POLL_INTERVAL_SEC) -> Iterator[Optional[str]]:
+    """
+    Yield the lines which are appended to a log file from now on.
+    The file is reopened after it was rotated. None is yielded after every poll interval without new lines
+    (e.g. to send a heart beat).
+    """
+    file = __open_at_end(log_file_path)
+    try:
+        pending = b''
+        while True:
+            chunk = file.readline() if file else b''
+            if chunk:
+                pending += chunk
+                if pending.endswith(b'\n'):
+                    yield pending.decode('utf-8', errors='replace')
+                    pending = b''
+                continue
+
+            if __is_rotated(log_file_path, file):
+                # rest of the rotated file has been read - continue with the new file from its start
+                if file:
+                    file.close()
+                file = __open(log_file_path)
+                continue
+
+            yield None
+            time.sleep(poll_interval_sec)
+    finally:
+        if file:
+            file.close()
+
+
+def __read_lines_backwards(path: str, block_size: int = LOG_BLOCK_SIZE) -> Iterator[bytes]:
+    """ yield the lines of a file (without line break) from the last to the first one """
+    with open(path, 'rb') as file:
+        position = file.seek(0, os.SEEK_END)
+        if position == 0:
+            return
+        remainder = b''
+        is_last_block = True
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            file.seek(position)
+            block = file.read(read_size) + remainder
+            if is_last_block and block.endswith(b'\n'):
+                block = block[:-1]
+            is_last_block = False
+            lines = block.split(b'\n')
+            # first line of the block might be incomplete - it is completed by the next (previous) block
+            remainder = lines.pop(0)
+            yield from reversed(lines)
+        yield remainder
+
+
+def __open(path: str):
+    try:
+        return open(path, 'rb')
+    except FileNotFoundError:
+        return None
+
+
+def __open_at_end(path: str):
+    file = __open(path)
+    if file:
+        file.seek(0, os.SEEK_END)
+    return file
+
+
+def __is_rotated(path: str, file) -> bool:
+    """ check if the path points to another file than the opened one (or was truncated) """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return False
+    if file is None:
+        return True
+    return stat.st_ino != os.fstat(file.fileno()).st_ino or stat.st_size < file.tell()
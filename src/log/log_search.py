@@ -0,0 +1,63 @@
+import logging
+import os
+from typing import BinaryIO, Iterator, List, Optional
+
+from src.log.logger import INDEX_HEADER, INDEX_RECORD, LOG_BACKUP_COUNT, index_file_path, read_tags
+
+# number of index records read at once after the time range was bisected
+INDEX_READ_RECORDS = 1024
+
+
+def search_log(log_file_path: str, start: Optional[float] = None, end: Optional[float] = None, min_level: int = logging.NOTSET,
+               tag: Optional[str] = None, texts: Optional[List[str]] = None, backup_count: int = LOG_BACKUP_COUNT) -> Iterator[dict]:
+    """
+    Search log entries (oldest first) of a log file and its rotated files by the index files.
+
+    The time range (epoch seconds, start <= t < end) is bisected in the fixed-width index records, minimum level and tag
+    are matched against the records of the range without decoding anything else. Only the matching entries are
+    read from the log files (by offset) - they are matched case-insensitive against any of the texts (if given).
+    Log files without index (or with an index of an earlier version) are skipped.
+    """
+    paths = [f'{log_file_path}.{number}' for number in range(backup_count, 0, -1)] + [log_file_path]
+    texts = [text.lower() for text in texts] if texts else None
+
+    for path in paths:
+        if not os.path.exists(path) or not os.path.exists(index_file_path(path)):
+            continue
+        tags = read_tags(path)
+        if tag is not None and tag not in tags:
+            continue
+        tag_id = tags.index(tag) + 1 if tag is not None else None
+
+        with open(index_file_path(path), 'rb') as index_file, open(path, 'rb') as log_file:
+            if index_file.read(len(INDEX_HEADER)) != INDEX_HEADER:
+                continue
+            count = (index_file.seek(0, os.SEEK_END) - len(INDEX_HEADER)) // INDEX_RECORD.size # incomplete last record is skipped
+            first = __bisect_time(index_file, start, 0, count) if start is not None else 0
+            last = __bisect_time(index_file, end, first, count) if end is not None else count
+
+            for position in range(first, last, INDEX_READ_RECORDS):
+                index_file.seek(len(INDEX_HEADER) + position * INDEX_RECORD.size)
+                records = index_file.read(min(INDEX_READ_RECORDS, last - position) * INDEX_RECORD.size)
+                for t, level, record_tag_id, offset, length in INDEX_RECORD.iter_unpack(records):
+                    if level < min_level or (tag_id is not None and record_tag_id != tag_id):
+                        continue
+
+                    log_file.seek(offset)
+                    entry = log_file.read(length).decode('utf-8', errors='replace')
+                    if texts is not None and not any(text in entry.lower() for text in texts):
+                        continue
+                    record_tag = tags[record_tag_id - 1] if 0 < record_tag_id <= len(tags) else None
+                    yield {'ts': t, 'level': logging.getLevelName(level), 'tag': record_tag, 'entry': entry}
+
+
+def __bisect_time(index_file: BinaryIO, t: float, low: int, high: int) -> int:
+    """ position of the first index record with time >= t (times of the records never decrease) """
+    while low < high:
+        middle = (low + high) // 2
+        index_file.seek(len(INDEX_HEADER) + middle * INDEX_RECORD.size)
+        if INDEX_RECORD.unpack(index_file.read(INDEX_RECORD.size))[0] < t:
+            low = middle + 1
+        else:
+            high = middle
+    return low
@@ -1,13 +1,153 @@
 import logging
+import os
+import re
+import struct
 from logging import Logger
 from logging.handlers import RotatingFileHandler
+from typing import Dict, List, Optional
+
+LOG_MAX_BYTES = 4000000
+LOG_BACKUP_COUNT = 4
+INDEX_FILE_SUFFIX = '.idx'
+TAG_FILE_SUFFIX = '.tags'
+# index file starts with a header - index files without it (json lines of earlier versions) are not used
+INDEX_HEADER = b'WSLOGIDX2\n'
+# fixed-width index record: time (epoch seconds), level, tag id (0 = no tag), byte offset and length of the log entry
+INDEX_RECORD = struct.Struct('<dBHQI')
+# tag at the start of a log message, e.g. '[-WATERING-] Running water pump ...'
+TAG_PATTERN = re.compile(r'^\[-(.+?)-\]')
+
+
+def index_file_path(log_file_path: str) -> str:
+    return log_file_path + INDEX_FILE_SUFFIX
+
+
+def tag_file_path(log_file_path: str) -> str:
+    return log_file_path + TAG_FILE_SUFFIX
+
+
+def parse_tag(message: str) -> Optional[str]:
+    match = TAG_PATTERN.match(message)
+    return match.group(1) if match else None
+
+
+def read_tags(log_file_path: str) -> List[str]:
+    """ read the tags of the index of a log file - the tag id of a tag is its position + 1 """
+    try:
+        with open(tag_file_path(log_file_path), 'rb') as tag_file:
+            lines = tag_file.read().split(b'\n')
+    except FileNotFoundError:
+        return []
+    return [line.decode('utf-8') for line in lines[:-1]] # last line is empty (or incomplete)
+
+
+class IndexedRotatingFileHandler(RotatingFileHandler):
+    """
+    Rotating file handler which writes a structured index (sidecar) next to the log file.
+
+    Every record gets one fixed-width record (`INDEX_RECORD`) in `<log file>.idx` with its time (epoch seconds),
+    level, tag id, byte offset and length in the log file. Tags are listed once in `<log file>.tags` (one per line).
+    The time of the index records never decreases (records created earlier by another thread get the time of
+    the previous record), so readers bisect the index by time. The index files are rotated together with the log files.
+    """
+
+    def __init__(self, filename: str, mode: str = 'a', maxBytes: int = 0, backupCount: int = 0, encoding: Optional[str] = 'utf-8'):
+        super().__init__(filename, mode=mode, maxBytes=maxBytes, backupCount=backupCount, encoding=encoding)
+        self.__open_index()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if self.shouldRollover(record):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.flush()
+            offset = self.stream.tell()
+            logging.FileHandler.emit(self, record)
+            length = self.stream.tell() - offset
+
+            self._last_time = max(self._last_time, record.created)
+            tag_id = self.__tag_id(parse_tag(record.getMessage()))
+            self._index_stream.write(INDEX_RECORD.pack(self._last_time, min(record.levelno, 255), tag_id, offset, length))
+            self._index_stream.flush()
+        except Exception:
+            self.handleError(record)
+
+    def doRollover(self) -> None:
+        super().doRollover()
+        self._index_stream.close()
+        self._tag_stream.close()
+        if self.backupCount > 0:
+            for file_path in (index_file_path, tag_file_path):
+                for number in range(self.backupCount - 1, 0, -1):
+                    source = file_path(f'{self.baseFilename}.{number}')
+                    if os.path.exists(source):
+                        os.replace(source, file_path(f'{self.baseFilename}.{number + 1}'))
+                if os.path.exists(file_path(self.baseFilename)):
+                    os.replace(file_path(self.baseFilename), file_path(f'{self.baseFilename}.1'))
+        self.__open_index(new=True)
+
+    def close(self) -> None:
+        self.acquire()
+        try:
+            self._index_stream.close()
+            self._tag_stream.close()
+        finally:
+            self.release()
+        super().close()
+
+    def __open_index(self, new: bool = False) -> None:
+        """ open the index files for appending - an incomplete last record is truncated, an index without header is replaced """
+        index_path = index_file_path(self.baseFilename)
+        self._tag_ids: Dict[str, int] = {}
+        self._last_time = 0.0
+
+        if not new and os.path.exists(index_path):
+            self._index_stream = open(index_path, 'rb+')
+            if self._index_stream.read(len(INDEX_HEADER)) == INDEX_HEADER:
+                size = self._index_stream.seek(0, os.SEEK_END)
+                count = (size - len(INDEX_HEADER)) // INDEX_RECORD.size
+                self._index_stream.truncate(len(INDEX_HEADER) + count * INDEX_RECORD.size)
+                if count > 0:
+                    self._index_stream.seek(len(INDEX_HEADER) + (count - 1) * INDEX_RECORD.size)
+                    self._last_time = INDEX_RECORD.unpack(self._index_stream.read(INDEX_RECORD.size))[0]
+                self._index_stream.seek(0, os.SEEK_END)
+                self._tag_ids = {tag: tag_id for tag_id, tag in enumerate(read_tags(self.baseFilename), start=1)}
+                self._tag_stream = open(tag_file_path(self.baseFilename), 'ab')
+                self._tag_stream.truncate(sum(len(tag.encode('utf-8')) + 1 for tag in self._tag_ids))
+                return
+            self._index_stream.close()
+
+        self._index_stream = open(index_path, 'wb')
+        self._index_stream.write(INDEX_HEADER)
+        self._index_stream.flush()
+        self._tag_stream = open(tag_file_path(self.baseFilename), 'wb')
+
+    def __tag_id(self, tag: Optional[str]) -> int:
+        """ id of a tag - new tags are written to the tag file before the first index record refers to them """
+        if tag is None:
+            return 0
+        tag_id = self._tag_ids.get(tag)
+        if tag_id is None:
+            tag_id = self._tag_ids[tag] = len(self._tag_ids) + 1
+            self._tag_stream.write(tag.encode('utf-8') + b'\n')
+            self._tag_stream.flush()
+        return tag_id
+
+
+
+# one handler per log file - loggers writing to the same file share it (and its rotation)
+__handlers: Dict[str, IndexedRotatingFileHandler] = {}
 
 
 def setup_logger(name: str, log_file: str, level: int=logging.INFO) -> Logger:
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', '%d-%m-%y %H:%M:%S')
+    handler = __handlers.get(os.path.abspath(log_file))
+    if handler is None:
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', '%d-%m-%y %H:%M:%S')
 
-    handler = RotatingFileHandler(log_file, mode='a', maxBytes=4000000, backupCount=4)        
-    handler.setFormatter(formatter)
+        handler = IndexedRotatingFileHandler(log_file, mode='a', maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)        
+        handler.setFormatter(formatter)
+        __handlers[os.path.abspath(log_file)] = handler
 
     logger = logging.getLogger(name)
     logger.setLevel(level)
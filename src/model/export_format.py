@@ -0,0 +1,8 @@
+#!/usr/bin/env python3
+
+from enum import Enum
+
+class ExportFormat(str, Enum):
+    csv = "csv"
+    parquet = "parquet"
+    arrow = "arrow"
@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class LogEntry(BaseModel):
+    ts: str # time of log entry in ISO format
+    level: str
+    tag: Optional[str] = None # e.g. WATERING or PICTURE
+    entry: str # formatted log entry
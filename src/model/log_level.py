@@ -0,0 +1,10 @@
+#!/usr/bin/env python3
+
+from enum import Enum
+
+class LogLevel(str, Enum):
+    debug = "DEBUG"
+    info = "INFO"
+    warning = "WARNING"
+    error = "ERROR"
+    critical = "CRITICAL"
@@ -0,0 +1,10 @@
+#!/usr/bin/env python3
+
+from pydantic import BaseModel
+
+
+class Picture(BaseModel):
+    name: str
+    ts: str # time of capture in ISO format
+    size: int # in bytes
+    thumbnail: bool # thumbnail is available
@@ -8,7 +8,7 @@ from pydantic import BaseModel
 class Plant(BaseModel):
     id: str
     name: str
-    moisture: int
+    moisture: Optional[int] = None # None if the moisture could not be read or was out of range
     conductivity: Optional[int] = None
     sunlight: Optional[int] = None
     temperature: Optional[float] = None
@@ -18,9 +18,10 @@ class Plant(BaseModel):
 class PlantSensorEntry(BaseModel):
     ts: str
     plants: List[Plant]
-    temperature: float
-    humidity: float
-    visible_light: int
-    UV_index: float
-    IR_light: int
+    # ambient values are None if they could not be read or were out of range
+    temperature: Optional[float] = None
+    humidity: Optional[float] = None
+    visible_light: Optional[int] = None
+    UV_index: Optional[float] = None
+    IR_light: Optional[int] = None
 
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class RollupValue(BaseModel):
+    min: float
+    max: float
+    mean: float
+    count: int
+
+
+class PlantRollup(BaseModel):
+    id: str
+    name: str
+    moisture: Optional[RollupValue] = None
+    conductivity: Optional[RollupValue] = None
+    temperature: Optional[RollupValue] = None
+    humidity: Optional[RollupValue] = None
+    light: Optional[RollupValue] = None
+
+
+class PlantSensorRollup(BaseModel):
+    ts: str # start of rollup period
+    plants: List[PlantRollup]
@@ -0,0 +1,7 @@
+#!/usr/bin/env python3
+
+from enum import Enum
+
+class RollupResolution(str, Enum):
+    hour = "hour"
+    day = "day"
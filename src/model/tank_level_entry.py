@@ -0,0 +1,11 @@
+#!/usr/bin/env python3
+
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class TankLevelEntry(BaseModel):
+    ts: str
+    distance: Optional[float] = None # in cm (None if no echo was received)
+    water_level: Optional[float] = None # in %
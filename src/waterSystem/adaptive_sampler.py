@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from src.db.db_adapter import DbAdapter
+from src.model.plant_configuration import PlantConfiguration
+from src.model.plant_entry import Plant, PlantSensorEntry
+from src.waterSystem.water_system_db_helper import query_and_persist_sensor_values, get_jobs_configuration_value
+
+logger = logging.getLogger('water.system')
+
+DEFAULT_SAMPLING_MIN_INTERVAL_MIN = 10
+DEFAULT_SAMPLING_MAX_INTERVAL_MIN = 120
+SAMPLING_INTERVAL_DECREASE_FACTOR = 0.5
+SAMPLING_INTERVAL_INCREASE_FACTOR = 1.5
+FAST_MOISTURE_CHANGE_PER_HOUR = 2.0 # in % per hour
+FLAT_MOISTURE_CHANGE_PER_HOUR = 0.5 # in % per hour
+FAST_LIGHT_CHANGE_PER_HOUR = 0.5 # relative change per hour
+FLAT_LIGHT_CHANGE_PER_HOUR = 0.1 # relative change per hour
+MIN_LIGHT = 100 # light values below are taken as this value for the relative change (night)
+NEAR_THRESHOLD_MOISTURE = 5 # in % to min or max moisture
+
+
+@dataclass
+class PlantSampling:
+    """ sampling state of a plant """
+    interval_min: float
+    due_at: datetime
+    sampled_at: Optional[datetime] = None
+    moisture: Optional[int] = None
+    light: Optional[int] = None
+
+
+class AdaptiveSampler(object):
+    """
+    Sampling of the plant sensors with an interval per plant between `sampling_min_interval_min` and `sampling_max_interval_min`
+    (see jobs configuration).
+
+    After every sample of a plant its interval is
+    - shortened if moisture or light change fast or the moisture is near the min or max moisture of the plant
+      (the interval never exceeds the time the moisture needs to reach the min moisture at its current rate)
+    - lengthened if moisture and light are flat
+    so stable readings (e.g. at night) are sampled less often, which saves db writes and bluetooth connections of Mi Flora sensors.
+
+    New plants are sampled immediately with the min interval. Every sampling round reads the ambient sensors
+    and the plants which are due and persists them as one sensor history entry.
+    """
+
+    def __init__(self):
+        self._plants: Dict[str, PlantSampling] = {}  # by plant id
+        self._lock = threading.Lock()
+
+    def run(self) -> Optional[PlantSensorEntry]:
+        """ sample all plants which are due (job of the water system runner) - returns the persisted entry (None if no plant is due) """
+        now = datetime.now()
+        configurations = DbAdapter().plant_configurations.all()
+        due_plant_ids = self.due_plant_ids(configurations, now)
+        if not due_plant_ids:
+            return None
+
+        plant_sensor_entry_obj = query_and_persist_sensor_values(due_plant_ids)
+        configurations_by_id = {configuration.id: configuration for configuration in configurations}
+        for plant in plant_sensor_entry_obj.plants:
+            if plant.id in configurations_by_id:
+                self.update(plant, configurations_by_id[plant.id], datetime.fromisoformat(plant_sensor_entry_obj.ts))
+        return plant_sensor_entry_obj
+
+    def due_plant_ids(self, configurations: List[PlantConfiguration], now: datetime) -> Set[str]:
+        """ ids of the configured plants which are due for sampling - state of deleted plants is dropped """
+        with self._lock:
+            configured_ids = {configuration.id for configuration in configurations}
+            for plant_id in set(self._plants) - configured_ids:
+                del self._plants[plant_id]
+            return {plant_id for plant_id in configured_ids if plant_id not in self._plants or self._plants[plant_id].due_at <= now}
+
+    def update(self, plant: Plant, configuration: PlantConfiguration, sampled_at: datetime) -> None:
+        """ adapt the interval of a plant to a new sample """
+        min_interval = get_jobs_configuration_value('sampling_min_interval_min', DEFAULT_SAMPLING_MIN_INTERVAL_MIN)
+        max_interval = get_jobs_configuration_value('sampling_max_interval_min', DEFAULT_SAMPLING_MAX_INTERVAL_MIN)
+
+        with self._lock:
+            sampling = self._plants.get(plant.id)
+            if sampling is None or sampling.sampled_at is None or plant.moisture is None or sampling.moisture is None:
+                interval = min_interval # first or invalid moisture sample (see `check_reading`)
+            else:
+                interval = self.__next_interval(sampling, plant, configuration, sampled_at)
+            interval = min(max_interval, max(min_interval, interval))
+
+            if sampling is not None and interval != sampling.interval_min:
+                logger.info(f'[-SAMPLING-] Sampling interval of {plant.name} (ID: {plant.id}) changed to {interval:.0f} min')
+            self._plants[plant.id] = PlantSampling(
+                interval_min=interval,
+                due_at=sampled_at + timedelta(minutes=interval),
+                sampled_at=sampled_at,
+                moisture=plant.moisture,
+                light=plant.sunlight)
+
+    def intervals(self) -> Dict[str, float]:
+        """ current sampling interval in minutes by plant id """
+        with self._lock:
+            return {plant_id: sampling.interval_min for plant_id, sampling in self._plants.items()}
+
+    def __next_interval(self, sampling: PlantSampling, plant: Plant, configuration: PlantConfiguration, sampled_at: datetime) -> float:
+        hours = max((sampled_at - sampling.sampled_at).total_seconds() / 3600, 1 / 60)
+        moisture_change = (plant.moisture - sampling.moisture) / hours
+        light_change = 0.0
+        if plant.sunlight is not None and sampling.light is not None:
+            light_change = abs(plant.sunlight - sampling.light) / max(sampling.light, MIN_LIGHT) / hours
+
+        distance_to_threshold = min(plant.moisture - configuration.min_moisture, configuration.max_moisture - plant.moisture)
+        if abs(moisture_change) >= FAST_MOISTURE_CHANGE_PER_HOUR or light_change >= FAST_LIGHT_CHANGE_PER_HOUR or distance_to_threshold <= NEAR_THRESHOLD_MOISTURE:
+            interval = sampling.interval_min * SAMPLING_INTERVAL_DECREASE_FACTOR
+        elif abs(moisture_change) <= FLAT_MOISTURE_CHANGE_PER_HOUR and light_change <= FLAT_LIGHT_CHANGE_PER_HOUR:
+            interval = sampling.interval_min * SAMPLING_INTERVAL_INCREASE_FACTOR
+        else:
+            interval = sampling.interval_min
+
+        if moisture_change < 0 and plant.moisture > configuration.min_moisture:
+            # sample again before the moisture falls below min moisture at its current rate
+            interval = min(interval, (plant.moisture - configuration.min_moisture) / -moisture_change * 60)
+        return interval
+
+
+adaptive_sampler = AdaptiveSampler()
@@ -1,14 +1,25 @@
+from .sensor_reading import SensorComponent, SensorReading, MoistureReading, TemperatureHumidityReading, SunlightReading, MifloraReading, UltrasonicReading, RelayReading
 from .relay import Relay
 from .moister_sensor import MoistureSensor, MoistureSensorType
+from .adc_sampler import AdcSampler
 from .temperature_humidity_sensor import TemperatureHumiditySensor, TempHumSensorType
 from .miflora_sensor import MifloraSensor
 from .sunlight_sensor import SunlightSensor
 from .ultra_sonic_ranger import UltrasonicRanger
 
 __all__ = [
+    "SensorComponent",
+    "SensorReading",
+    "MoistureReading",
+    "TemperatureHumidityReading",
+    "SunlightReading",
+    "MifloraReading",
+    "UltrasonicReading",
+    "RelayReading",
     "Relay",
     "MoistureSensor",
     "MoistureSensorType",
+    "AdcSampler",
     "TemperatureHumiditySensor",
     "TempHumSensorType",
     "MifloraSensor",
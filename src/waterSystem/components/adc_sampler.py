@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+import statistics
+from .hardware_backend import is_simulated
+if is_simulated():
+    from .simulated import SimulatedAdc as ADC
+else:
+    from grove.adc import ADC
+
+REDUCTION_MEDIAN = 'median'
+REDUCTION_TRIMMED_MEAN = 'trimmed_mean'
+
+_TRIM_PROPORTION = 0.2
+
+
+class AdcSampler:
+    """
+    [Analog]
+    Shared sampler of the Analog to Digital Converter (ADC) - external chip unit on grove pi hat
+
+    Reads all requested channels in one pass with one ADC instance. Every channel is sampled 
+    several times in a burst and the samples are reduced to one voltage (median or trimmed mean) to suppress noise.
+
+    Args:
+        samples(int): number of samples per channel
+        reduction(string): reduction of samples - either 'median' or 'trimmed_mean'
+    """
+
+    def __init__(self, samples=9, reduction=REDUCTION_MEDIAN):
+        if reduction not in (REDUCTION_MEDIAN, REDUCTION_TRIMMED_MEAN):
+            raise ValueError('Unknown reduction "{}"'.format(reduction))
+        self._samples = max(1, samples)
+        self._reduction = reduction
+        self.adc = ADC()
+
+    def read_voltages(self, channels):
+        """
+        Read voltages of all channels
+
+        Returns:
+            (dict): reduced voltage in mV by channel
+        """
+        voltages = {}
+        for channel in set(channels):
+            samples = [self.adc.read_voltage(channel) for _ in range(self._samples)]
+            voltages[channel] = round(self.__reduce(samples))
+        return voltages
+
+    def __reduce(self, samples):
+        if self._reduction == REDUCTION_MEDIAN:
+            return statistics.median(samples)
+
+        samples = sorted(samples)
+        trim = int(len(samples) * _TRIM_PROPORTION)
+        return statistics.mean(samples[trim:len(samples) - trim])
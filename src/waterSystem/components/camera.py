@@ -1,14 +1,36 @@
-from picamera import PiCamera
+from .hardware_backend import is_simulated
+if is_simulated():
+    from .simulated import SimulatedCamera as PiCamera
+else:
+    from picamera import PiCamera
 from datetime import datetime
 import logging
+import os
+import threading
 
 
-camera = PiCamera()
+DEFAULT_RESOLUTION = (1920, 1080)
+PICTURE_NAME_PREFIX = 'plant_image_'
+
+_camera = None
+_camera_lock = threading.Lock()
 logger = logging.getLogger('water.system')
 
-def take_picture():
-    """Take a picutre with Pi Camera and save with timestamp"""
+def get_camera():
+    """Get Pi Camera - opened on first use"""
+    global _camera
+    with _camera_lock:
+        if _camera is None:
+            _camera = PiCamera()
+        return _camera
+
+def take_picture(directory, resolution=DEFAULT_RESOLUTION, file_name=None):
+    """Take a picutre with Pi Camera and save with timestamp (or file_name) in directory"""
     now = datetime.now()
-    time_stamp = now.isoformat()
-    camera.capture('/home/pi/Projects/plantWaterSystem/src/db/pictures/plant_image_%s.jpg' % time_stamp)
-    logger.info('[-PICTURE-] Successfully took picture! Saved in /db/pictures')
+    time_stamp = now.isoformat(timespec='seconds')
+    path = os.path.join(directory, file_name or f'{PICTURE_NAME_PREFIX}{time_stamp}.jpg')
+    camera = get_camera()
+    camera.resolution = resolution
+    camera.capture(path)
+    logger.info(f'[-PICTURE-] Successfully took picture! Saved in {path}')
+    return path
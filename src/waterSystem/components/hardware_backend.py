@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+
+import os
+
+# environment variable selecting the hardware backend of the components
+HARDWARE_BACKEND_ENV_VAR = 'WATER_SYSTEM_HARDWARE'
+
+HARDWARE_BACKEND_GROVE = 'grove'
+HARDWARE_BACKEND_SIMULATED = 'simulated'
+
+
+def hardware_backend():
+    """ configured hardware backend - `grove` (default, Raspberry Pi with grove hat) OR `simulated` """
+    return os.environ.get(HARDWARE_BACKEND_ENV_VAR, HARDWARE_BACKEND_GROVE).lower()
+
+
+def is_simulated():
+    return hardware_backend() == HARDWARE_BACKEND_SIMULATED
@@ -3,12 +3,21 @@
 import argparse
 import re
 
-from miflora.miflora_poller import MiFloraPoller, MI_CONDUCTIVITY, MI_MOISTURE, MI_LIGHT, MI_TEMPERATURE, MI_BATTERY
-from btlewrap.bluepy import BluepyBackend
-from miflora import miflora_scanner
+from .hardware_backend import is_simulated
+if is_simulated():
+    from .simulated import SimulatedMiFloraPoller as MiFloraPoller, SimulatedMiFloraScanner as miflora_scanner
+    from .simulated import MI_CONDUCTIVITY, MI_MOISTURE, MI_LIGHT, MI_TEMPERATURE, MI_BATTERY
+    BluepyBackend = None
+else:
+    from miflora.miflora_poller import MiFloraPoller, MI_CONDUCTIVITY, MI_MOISTURE, MI_LIGHT, MI_TEMPERATURE, MI_BATTERY
+    from btlewrap.bluepy import BluepyBackend
+    from miflora import miflora_scanner
+from datetime import datetime
 
+from .sensor_reading import SensorComponent, MifloraReading
 
-class MifloraSensor:
+
+class MifloraSensor(SensorComponent):
     """
     [Bluetooth]
     Miflora Sensor class for:
@@ -17,10 +26,11 @@ class MifloraSensor:
 
     Args:
         adress(string): MAC address of Miflora Sensor
+        cache_timeout(int): max age in seconds of the values cached by the poller
     """
-    def __init__(self, address):
+    def __init__(self, address, cache_timeout=600):
         if self.__valid_mac_address(address):
-            self.poller = MiFloraPoller(address, BluepyBackend)
+            self.poller = MiFloraPoller(address, BluepyBackend, cache_timeout=cache_timeout)
 
     def __valid_mac_address(self, mac, pat=re.compile(r"[0-9A-F]{2}:[0-9A-F]{2}:[0-9A-F]{2}:[0-9A-F]{2}:[0-9A-F]{2}:[0-9A-F]{2}")):
         # Check for valid mac adresses
@@ -40,6 +50,21 @@ class MifloraSensor:
     def get_name(self):
         return self.poller.name()
 
+    def refresh(self):
+        """Read all sensor values with one bluetooth connection - the read_* methods return these values until the cache times out"""
+        self.poller.fill_cache()
+
+    def read_all(self):
+        """Read all sensor values with one bluetooth connection"""
+        self.refresh()
+        return MifloraReading(
+            read_at=datetime.now(),
+            moisture=self.read_moisture(),
+            conductivity=self.read_conductivity(),
+            sunlight=self.read_sunlight(),
+            temperature=self.read_temperature(),
+            battery_level=self.get_battery_level())
+
     def get_battery_level(self):
         """in %"""
         return self.poller.parameter_value(MI_BATTERY)
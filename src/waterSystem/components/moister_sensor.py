@@ -1,10 +1,17 @@
 #!/usr/bin/env python3
 
-from grove.adc import ADC
+from .hardware_backend import is_simulated
+if is_simulated():
+    from .simulated import SimulatedAdc as ADC
+else:
+    from grove.adc import ADC
 import enum
+from datetime import datetime
 
+from .sensor_reading import SensorComponent, MoistureReading
 
-class MoistureSensor:
+
+class MoistureSensor(SensorComponent):
     """
     [Analog]
     Moisture Sensor class for:
@@ -13,19 +20,32 @@ class MoistureSensor:
     Args:
         channel(int): number of analog pin/channel the sensor connected.
         sensor_type(MoistureSensorType): enum of MoistureSensorType indicating its type
+        adc(ADC): shared Analog to Digital Converter (optional - a new one is created by default)
     """
 
-    def __init__(self, channel, sensor_type):
+    def __init__(self, channel, sensor_type, adc=None):
         self._channel = channel 
         self._sensor_type = sensor_type
         # Analog to Digital Converter (ADC) - external chip unit on grove pi hat
-        self.adc = ADC()
+        self.adc = adc if adc is not None else ADC()
 
     @property
     def sensor_type(self):
         """Get moisture sensor type - either STANDARD (1) or CAPACITIVE (2)"""
         return self._sensor_type
 
+    @property
+    def channel(self):
+        return self._channel
+
+    def read_all(self):
+        """Read voltage and moisture in % with one ADC read"""
+        return self.convert_voltage(self.adc.read_voltage(self._channel))
+
+    def convert_voltage(self, value):
+        """Convert a voltage (e.g. sampled by AdcSampler) to a reading with moisture in %"""
+        return MoistureReading(read_at=datetime.now(), voltage=value, moisture=self.__convert_voltage_to_percent(value))
+
     def read_moisture(self):
         """
         Get the moisture strength value/voltage
@@ -38,11 +58,14 @@ class MoistureSensor:
             (int): mosture in %
         """
 
+        value = self.adc.read_voltage(self._channel)
+
+        return self.__convert_voltage_to_percent(value)
+
+
+    def __convert_voltage_to_percent(self, value):
         min_moisture = 0 if self._sensor_type == MoistureSensorType.STANDARD.value else 2020
         max_moisture = 2200 if self._sensor_type == MoistureSensorType.STANDARD.value else 1300
-        
-
-        value = self.adc.read_voltage(self._channel)
 
         return self.__convert_moisture_voltage_to_percent(min_moisture, max_moisture, value)
 
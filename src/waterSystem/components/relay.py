@@ -1,9 +1,16 @@
 #!/usr/bin/env python3
 
-from grove.gpio import GPIO
+from .hardware_backend import is_simulated
+if is_simulated():
+    from .simulated import SimulatedGpio as GPIO
+else:
+    from grove.gpio import GPIO
+from datetime import datetime
 
+from .sensor_reading import SensorComponent, RelayReading
 
-class Relay(GPIO):
+
+class Relay(GPIO, SensorComponent):
     """
     [Digital GPIO]
     Relay class for:
@@ -23,6 +30,10 @@ class Relay(GPIO):
     def __init__(self, pin):
         super(Relay, self).__init__(pin, GPIO.OUT) # type: ignore
 
+    def read_all(self):
+        """ read switch state of electric circuit channel 1"""
+        return RelayReading(read_at=datetime.now(), is_on=bool(self.read()))
+
     def on(self):
         """ switch on electric circuit channel 1"""
         self.write(1)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field, fields, replace
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+def _value_range(min_value: Optional[float] = None, max_value: Optional[float] = None):
+    """ field of a reading with the range of plausible values (bounds included, None is unbounded) """
+    return field(default=None, metadata={'range': (min_value, max_value)})
+
+
+@dataclass
+class SensorReading:
+    """
+    Snapshot of all values of a component read by one hardware transaction.
+    A value is invalid if it could not be read (None) or is out of the range of plausible values of its field.
+    """
+    read_at: datetime
+
+    @property
+    def validity(self) -> Dict[str, bool]:
+        """ validity of all values by field name """
+        return {field.name: self.is_valid(field.name) for field in fields(self) if field.name != 'read_at'}
+
+    def is_valid(self, field_name: str) -> bool:
+        value = getattr(self, field_name)
+        if value is None:
+            return False
+        min_value, max_value = next(field.metadata.get('range', (None, None)) for field in fields(self) if field.name == field_name)
+        return (min_value is None or value >= min_value) and (max_value is None or value <= max_value)
+
+    def out_of_range_fields(self) -> List[str]:
+        """ names of the fields whose values were read but are out of range """
+        return [field_name for field_name, valid in self.validity.items() if not valid and getattr(self, field_name) is not None]
+
+    def without_out_of_range_values(self) -> 'SensorReading':
+        """ copy of the reading with the values which are out of range set to None (invalid) - valid values are kept """
+        return replace(self, **{field_name: None for field_name in self.out_of_range_fields()})
+
+
+@dataclass
+class MoistureReading(SensorReading):
+    voltage: Optional[int] = _value_range(0, 3300) # in mV (3.3 V ADC)
+    moisture: Optional[int] = _value_range(0, 100) # in %
+
+
+@dataclass
+class TemperatureHumidityReading(SensorReading):
+    temperature: Optional[float] = _value_range(-40, 80) # in degrees [Celsuis]
+    humidity: Optional[float] = _value_range(0, 100) # in %
+
+
+@dataclass
+class SunlightReading(SensorReading):
+    visible_light: Optional[int] = _value_range(0) # in lumen
+    uv_index: Optional[float] = _value_range(0, 20)
+    ir_light: Optional[int] = _value_range(0)
+
+
+@dataclass
+class MifloraReading(SensorReading):
+    moisture: Optional[int] = _value_range(0, 100) # in %
+    conductivity: Optional[int] = _value_range(0, 10000) # in µS/cm
+    sunlight: Optional[int] = _value_range(0, 100000) # in lux
+    temperature: Optional[float] = _value_range(-40, 80) # in degrees [Celsuis]
+    battery_level: Optional[int] = _value_range(0, 100) # in %
+
+
+@dataclass
+class UltrasonicReading(SensorReading):
+    distance: Optional[float] = _value_range(0, 400) # in cm
+    water_level: Optional[float] = _value_range(0, 100) # in %
+
+
+@dataclass
+class RelayReading(SensorReading):
+    is_on: Optional[bool] = None
+
+
+class SensorComponent(ABC):
+    """ Common driver interface of the components """
+
+    @abstractmethod
+    def read_all(self) -> SensorReading:
+        """ read all values of the component with one hardware transaction """
@@ -0,0 +1,21 @@
+from .simulation import Simulation, SimulatedHardwareError, simulation
+from .devices import SimulatedAdc, SimulatedGpio, SimulatedDht, SimulatedSi114x, SimulatedMiFloraPoller, SimulatedMiFloraScanner, SimulatedCamera
+from .devices import MI_CONDUCTIVITY, MI_MOISTURE, MI_LIGHT, MI_TEMPERATURE, MI_BATTERY
+
+__all__ = [
+    "Simulation",
+    "SimulatedHardwareError",
+    "simulation",
+    "SimulatedAdc",
+    "SimulatedGpio",
+    "SimulatedDht",
+    "SimulatedSi114x",
+    "SimulatedMiFloraPoller",
+    "SimulatedMiFloraScanner",
+    "SimulatedCamera",
+    "MI_CONDUCTIVITY",
+    "MI_MOISTURE",
+    "MI_LIGHT",
+    "MI_TEMPERATURE",
+    "MI_BATTERY"
+]
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import zlib
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from .simulation import simulation, SimulatedHardwareError, DEVICE_ADC, DEVICE_GPIO, DEVICE_DHT, DEVICE_SI114X, DEVICE_MIFLORA, DEVICE_CAMERA
+
+# voltage range of a capacitive moisture sensor (dry, wet) in mV
+_CAPACITIVE_DRY_MV = 2020
+_CAPACITIVE_WET_MV = 1300
+_ADC_NOISE_MV = 5
+
+# Mi Flora parameters (see miflora.miflora_poller)
+MI_CONDUCTIVITY = 'conductivity'
+MI_MOISTURE = 'moisture'
+MI_LIGHT = 'light'
+MI_TEMPERATURE = 'temperature'
+MI_BATTERY = 'battery'
+
+# size of a simulated picture
+_PICTURE_SIZE_BYTES = 200 * 1024
+
+
+def _phase(key):
+    """ stable phase (0..1) of the synthetic curves of a sensor """
+    return (zlib.crc32(str(key).encode()) % 1000) / 1000
+
+
+class SimulatedAdc(object):
+    """ Analog to Digital Converter - voltages of capacitive moisture sensors (see grove.adc.ADC) """
+
+    def __init__(self, address=0x04):
+        self.address = address
+
+    def read_voltage(self, channel):
+        """ voltage in mV """
+        simulation.read(DEVICE_ADC)
+        moisture = simulation.moisture(_phase(channel))
+        voltage = _CAPACITIVE_DRY_MV - (_CAPACITIVE_DRY_MV - _CAPACITIVE_WET_MV) * moisture / 100
+        return round(simulation.gauss(voltage, _ADC_NOISE_MV))
+
+
+class SimulatedGpio(object):
+    """
+    GPIO pin (see grove.gpio.GPIO) - written values are read back.
+
+    An input pin which was set as output before answers with an echo pulse like an ultrasonic ranger
+    (distance of a slowly emptied water tank). A failed read results in a missing echo.
+    """
+    OUT = 'out'
+    IN = 'in'
+
+    def __init__(self, pin, direction=None):
+        self.pin = pin
+        self._direction = direction
+        self._value = 0
+        self._echo = None # (start, end) of echo pulse in seconds (time.time)
+
+    def dir(self, direction):
+        if direction == self.IN and self._direction == self.OUT:
+            self.__trigger_echo()
+        self._direction = direction
+
+    def write(self, output):
+        simulation.read(DEVICE_GPIO)
+        self._value = output
+
+    def read(self):
+        if self._echo is not None:
+            now = time.time()
+            return 1 if self._echo[0] <= now < self._echo[1] else 0
+        return self._value
+
+    def __trigger_echo(self):
+        if simulation.fails(DEVICE_GPIO):
+            self._echo = None
+            self._value = 0
+            return
+        # water level falling from full (2 cm) to empty (11 cm) within a week
+        distance_cm = 2 + 9 * ((simulation.now() / (7 * 24 * 60 * 60) + _phase(self.pin)) % 1)
+        start = time.time()
+        self._echo = (start, start + distance_cm * 2 * 29 / 1000000)
+
+
+class SimulatedDht(object):
+    """ DHT temperature and humidity sensor (see seeed_dht.DHT) - a failed read returns no values """
+
+    def __init__(self, dht_type, pin):
+        self.dht_type = dht_type
+        self.pin = pin
+
+    def read(self):
+        """ humidity in % and temperature in degrees [Celsuis] """
+        try:
+            simulation.read(DEVICE_DHT)
+        except SimulatedHardwareError:
+            return None, None
+        temperature = simulation.daily_wave(21, 4, 15) + simulation.gauss(0, 0.2)
+        humidity = simulation.daily_wave(55, -10, 15) + simulation.gauss(0, 0.5)
+        return round(humidity, 1), round(temperature, 1)
+
+
+class SimulatedSi114x(object):
+    """ SI1145 sunlight sensor (see seeed_si114x.grove_si114x) """
+
+    @property
+    def ReadVisible(self):
+        simulation.read(DEVICE_SI114X)
+        return round(260 + simulation.daylight(400))
+
+    @property
+    def ReadUV(self):
+        simulation.read(DEVICE_SI114X)
+        return round(simulation.daylight(600))
+
+    @property
+    def ReadIR(self):
+        simulation.read(DEVICE_SI114X)
+        return round(250 + simulation.daylight(800))
+
+
+class SimulatedMiFloraPoller(object):
+    """ Mi Flora poller (see miflora.miflora_poller.MiFloraPoller) - values are cached by `fill_cache` """
+
+    def __init__(self, mac, backend=None, cache_timeout=600):
+        self._mac = mac
+        self._cache = None
+
+    def fill_cache(self):
+        simulation.read(DEVICE_MIFLORA)
+        phase = _phase(self._mac)
+        moisture = simulation.moisture(phase)
+        self._cache = {
+            MI_MOISTURE: round(moisture),
+            MI_CONDUCTIVITY: round(300 + 10 * moisture),
+            MI_LIGHT: round(simulation.daylight(20000)),
+            MI_TEMPERATURE: round(simulation.daily_wave(21, 4, 15), 1),
+            MI_BATTERY: 100 - round(phase * 50),
+        }
+
+    def parameter_value(self, parameter):
+        if self._cache is None:
+            self.fill_cache()
+        return self._cache[parameter]
+
+    def fetch_history(self):
+        return []
+
+    def clear_history(self):
+        pass
+
+    def firmware_version(self):
+        return 'simulated'
+
+    def name(self):
+        return 'Flower care'
+
+
+class SimulatedMiFloraScanner(object):
+    """ Mi Flora scanner (see miflora.miflora_scanner) - there are no devices to be found """
+
+    @staticmethod
+    def scan(backend, timeout):
+        return []
+
+
+class SimulatedCamera(object):
+    """
+    Pi Camera (see picamera.PiCamera) - writes a JPEG picture of noise in the configured resolution
+    (a picture of random bytes with JPEG markers if Pillow is not installed)
+    """
+
+    def __init__(self):
+        self.resolution = (1920, 1080)
+
+    def capture(self, output):
+        simulation.read(DEVICE_CAMERA)
+        if Image is None:
+            with open(output, 'wb') as file:
+                file.write(b'\xff\xd8' + os.urandom(_PICTURE_SIZE_BYTES) + b'\xff\xd9')
+            return
+        width, height = self.resolution
+        # noise is scaled up from a small picture to keep the capture cheap
+        noise_size = (max(1, width // 16), max(1, height // 16))
+        noise = Image.frombytes('RGB', noise_size, os.urandom(3 * noise_size[0] * noise_size[1]))
+        noise.resize((width, height)).save(output, 'JPEG', quality=95)
+
+    def close(self):
+        pass
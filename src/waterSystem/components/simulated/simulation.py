@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+import math
+import os
+import random
+import threading
+import time
+
+# simulated devices
+DEVICE_ADC = 'adc'
+DEVICE_GPIO = 'gpio'
+DEVICE_DHT = 'dht'
+DEVICE_SI114X = 'si114x'
+DEVICE_MIFLORA = 'miflora'
+DEVICE_CAMERA = 'camera'
+
+# default (latency, jitter) in ms per read of a device
+_DEFAULT_TIMINGS_MS = {
+    DEVICE_ADC: (1, 0.2),
+    DEVICE_GPIO: (0, 0),
+    DEVICE_DHT: (250, 50),
+    DEVICE_SI114X: (10, 2),
+    DEVICE_MIFLORA: (2000, 500),
+    DEVICE_CAMERA: (1500, 200),
+}
+
+_ENV_PREFIX = 'WATER_SYSTEM_SIM_'
+
+_SECONDS_PER_DAY = 24 * 60 * 60
+MOISTURE_DRYING_PERIOD_SEC = 3 * _SECONDS_PER_DAY # period of watering and drying of the synthetic soil
+MOISTURE_WET = 85 # in %
+MOISTURE_DRY = 25 # in %
+
+
+class SimulatedHardwareError(IOError):
+    """ simulated failure of a hardware read """
+
+
+class Simulation(object):
+    """
+    Settings and synthetic environment of the simulated hardware backend.
+
+    Settings are read from environment variables - per device settings (e.g. `WATER_SYSTEM_SIM_MIFLORA_LATENCY_MS`)
+    override the settings for all devices (e.g. `WATER_SYSTEM_SIM_LATENCY_MS`):
+    * `LATENCY_MS`: mean latency of one read
+    * `JITTER_MS`: standard deviation of the latency
+    * `FAILURE_RATE`: probability (0..1) of a failed read
+    * `TIME_SCALE`: speed up of the synthetic value curves (e.g. 3600 to simulate one hour per second)
+    * `SEED`: random seed for reproducible runs
+
+    The synthetic curves follow the time of day (temperature, humidity, light) and a saw tooth of
+    watering and drying (moisture) with a phase per sensor.
+    """
+
+    def __init__(self):
+        self._time_scale = float(os.environ.get(_ENV_PREFIX + 'TIME_SCALE', 1))
+        self._start = time.time()
+        seed = os.environ.get(_ENV_PREFIX + 'SEED')
+        self._random = random.Random(int(seed) if seed is not None else None)
+        self._random_lock = threading.Lock()
+
+    def latency_ms(self, device):
+        return self.__setting(device, 'LATENCY_MS', _DEFAULT_TIMINGS_MS[device][0])
+
+    def jitter_ms(self, device):
+        return self.__setting(device, 'JITTER_MS', _DEFAULT_TIMINGS_MS[device][1])
+
+    def failure_rate(self, device):
+        return self.__setting(device, 'FAILURE_RATE', 0)
+
+    def read(self, device):
+        """ simulate the latency of a read and raise a SimulatedHardwareError for a failed read """
+        latency_sec = max(0.0, self.gauss(self.latency_ms(device), self.jitter_ms(device))) / 1000
+        if latency_sec > 0:
+            time.sleep(latency_sec)
+        if self.fails(device):
+            raise SimulatedHardwareError('Simulated failure of {} read'.format(device))
+
+    def fails(self, device):
+        failure_rate = self.failure_rate(device)
+        return failure_rate > 0 and self.uniform(0, 1) < failure_rate
+
+    def gauss(self, mean, deviation):
+        with self._random_lock:
+            return self._random.gauss(mean, deviation) if deviation > 0 else mean
+
+    def uniform(self, low, high):
+        with self._random_lock:
+            return self._random.uniform(low, high)
+
+    def now(self):
+        """ simulated time (epoch seconds) """
+        return self._start + (time.time() - self._start) * self._time_scale
+
+    def daily_wave(self, mean, amplitude, peak_hour):
+        """ value following the time of day with its maximum at peak_hour """
+        local_time = time.localtime(self.now())
+        hour = local_time.tm_hour + local_time.tm_min / 60 + local_time.tm_sec / 3600
+        return mean + amplitude * math.cos(2 * math.pi * (hour - peak_hour) / 24)
+
+    def daylight(self, maximum):
+        """ value of a light sensor - zero at night (6 pm to 6 am), maximum at noon """
+        return max(0.0, self.daily_wave(0, maximum, 12))
+
+    def moisture(self, phase):
+        """ moisture in % of soil drying from wet to dry and watered again (phase 0..1 shifts the saw tooth) """
+        position = (self.now() / MOISTURE_DRYING_PERIOD_SEC + phase) % 1
+        return MOISTURE_WET - (MOISTURE_WET - MOISTURE_DRY) * position
+
+    def __setting(self, device, name, default):
+        value = os.environ.get('{}{}_{}'.format(_ENV_PREFIX, device.upper(), name), os.environ.get(_ENV_PREFIX + name))
+        return float(value) if value is not None else default
+
+
+simulation = Simulation()
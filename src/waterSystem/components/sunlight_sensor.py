@@ -1,15 +1,26 @@
 #!/usr/bin/env python3
 
-import seeed_si114x
+from .hardware_backend import is_simulated
+if is_simulated():
+    from .simulated import SimulatedSi114x as grove_si114x
+else:
+    from seeed_si114x import grove_si114x
+from datetime import datetime
 
-class SunlightSensor:
+from .sensor_reading import SensorComponent, SunlightReading
+
+class SunlightSensor(SensorComponent):
     """
     [I2C]
     Sunlight Sensor class for:
         Moisture Sensor (https://wiki.seeedstudio.com/Grove-Moisture_Sensor/)
     """
     def __init__(self):
-        self.SI1145 = seeed_si114x.grove_si114x()
+        self.SI1145 = grove_si114x()
+
+    def read_all(self):
+        """ visible, UV and IR light read back to back """
+        return SunlightReading(read_at=datetime.now(), visible_light=self.readVisible(), uv_index=self.readUV(), ir_light=self.readIR())
 
     def readVisible(self):
         """ visible light of Ambient in lumen """
@@ -1,10 +1,17 @@
 #!/usr/bin/env python3
 
-import seeed_dht
+from .hardware_backend import is_simulated
+if is_simulated():
+    from .simulated import SimulatedDht as DHT
+else:
+    from seeed_dht import DHT
 import enum
+from datetime import datetime
 
+from .sensor_reading import SensorComponent, TemperatureHumidityReading
 
-class TemperatureHumiditySensor:
+
+class TemperatureHumiditySensor(SensorComponent):
     """
     [Digital]
     Temperature and Humidity Sensor class for:
@@ -16,12 +23,17 @@ class TemperatureHumiditySensor:
         sensor_type(MoistureSensorType): enum of MoistureSensorType indicating its type [DHT11 is type '11', DHT22 is type '22']
     """
     def __init__(self, channel, sensor_type):
-        self.dht_sensor = seeed_dht.DHT(sensor_type, channel)
+        self.dht_sensor = DHT(sensor_type, channel)
 
     @property
     def dht_sensor_type(self):
         return self.dht_sensor.dht_type
 
+    def read_all(self):
+        """Read temperature and humidity with one sensor read"""
+        humi, temp = self.dht_sensor.read()
+        return TemperatureHumidityReading(read_at=datetime.now(), temperature=temp, humidity=humi)
+
     def read_temperature(self):
         """Read temperature in degrees [Celsuis]"""
         temp = self.dht_sensor.read()[1]
@@ -1,29 +1,61 @@
 #!/usr/bin/env python3
 
+import statistics
 import time
-from grove.gpio import GPIO
- 
+from .hardware_backend import is_simulated
+if is_simulated():
+    from .simulated import SimulatedGpio as GPIO
+else:
+    from grove.gpio import GPIO
+from datetime import datetime
+
+from .sensor_reading import SensorComponent, UltrasonicReading
+
 usleep = lambda x: time.sleep(x / 1000000.0)
- 
-_TIMEOUT1 = 1000
-_TIMEOUT2 = 10000
+
+_ECHO_START_TIMEOUT_SEC = 0.00053 # max delay of echo pulse after trigger
+_ECHO_TIMEOUT_SEC = 0.025 # max length of echo pulse (~4 m)
+_SAMPLE_INTERVAL_SEC = 0.06 # min pause between two measurements (echo of previous measurement)
 
 _MAX_WATER_LEVEL_CM = 1.5
 _MIN_WATER_LEVEL_CM = 11
- 
-class UltrasonicRanger(object):
+
+class UltrasonicRanger(SensorComponent):
     """
     [Digital GPIO]
     Ultra Soonic Ranger class for:
         Ultra Sonic Ranger (https://wiki.seeedstudio.com/Grove-Ultrasonic_Ranger/)
 
+    Waits for the echo are bounded by time (max ~25 ms busy waiting per measurement).
+
     Args:
         pin(int): number of digital pin/channel the sensor connected.
-
+        max_water_level_cm(float): distance in cm to the water surface of a full tank
+        min_water_level_cm(float): distance in cm to the water surface of an empty tank
     """
-    def __init__(self, pin):
+    def __init__(self, pin, max_water_level_cm=_MAX_WATER_LEVEL_CM, min_water_level_cm=_MIN_WATER_LEVEL_CM):
         self.dio =GPIO(pin)
- 
+        self._max_water_level_cm = max_water_level_cm
+        self._min_water_level_cm = min_water_level_cm
+
+    def read_all(self):
+        """ distance and water level of one distance measurement """
+        distance = self.get_distance()
+        return UltrasonicReading(read_at=datetime.now(), distance=distance, water_level=self.__distance_to_water_level(distance))
+
+    def read_median(self, samples=5):
+        """ distance and water level of the median of several distance measurements (failed measurements are skipped) """
+        distances = []
+        for sample in range(samples):
+            if sample > 0:
+                time.sleep(_SAMPLE_INTERVAL_SEC)
+            distance = self.get_distance()
+            if distance is not None:
+                distances.append(distance)
+
+        distance = round(statistics.median(distances), 1) if distances else None
+        return UltrasonicReading(read_at=datetime.now(), distance=distance, water_level=self.__distance_to_water_level(distance))
+
     def get_distance(self):
         self.dio.dir(GPIO.OUT)
         self.dio.write(0)
@@ -31,48 +63,34 @@ class UltrasonicRanger(object):
         self.dio.write(1)
         usleep(10)
         self.dio.write(0)
- 
+
         self.dio.dir(GPIO.IN)
- 
-        t0 = time.time()
-        count = 0
-        while count < _TIMEOUT1:
-            if self.dio.read():
-                break
-            count += 1
-        if count >= _TIMEOUT1:
-            return None
- 
-        t1 = time.time()
-        count = 0
-        while count < _TIMEOUT2:
-            if not self.dio.read():
-                break
-            count += 1
-        if count >= _TIMEOUT2:
-            return None
- 
-        t2 = time.time()
- 
-        dt = int((t1 - t0) * 1000000)
-        if dt > 530:
-            return None
- 
+
+        t0 = time.perf_counter()
+        while not self.dio.read():
+            if time.perf_counter() - t0 > _ECHO_START_TIMEOUT_SEC:
+                return None
+
+        t1 = time.perf_counter()
+        while self.dio.read():
+            if time.perf_counter() - t1 > _ECHO_TIMEOUT_SEC:
+                return None
+
+        t2 = time.perf_counter()
+
         distance = ((t2 - t1) * 1000000 / 29 / 2) # cm
- 
+
         return round(distance, 1)
 
     def convert_distance_to_water_level(self):
-        distance = self.get_distance()
-        
-        if distance is None:
-            return -1
-
-        absolute_distance_cm = distance - _MIN_WATER_LEVEL_CM
-        distance_percentage = (absolute_distance_cm * 100) / _MAX_WATER_LEVEL_CM
-        water_level_percentage =  100 - distance_percentage
-        return round(water_level_percentage, 1)
+        water_level = self.__distance_to_water_level(self.get_distance())
+        return water_level if water_level is not None else -1
 
+    def __distance_to_water_level(self, distance):
+        """ water level in % between min (empty tank) and max (full tank) water level """
+        if distance is None:
+            return None
 
-        
- 
+        water_level_cm = self._min_water_level_cm - distance
+        water_level_percentage = (water_level_cm * 100) / (self._min_water_level_cm - self._max_water_level_cm)
+        return round(min(100.0, max(0.0, water_level_percentage)), 1)
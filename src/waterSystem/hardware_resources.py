@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+
+import threading
+
+#######################################################################
+# locks of hardware resources which must not be accessed concurrently #
+#######################################################################
+
+BLE_LOCK = threading.Lock() # bluetooth adapter (Mi Flora sensors)
+I2C_LOCK = threading.Lock() # I2C bus (ADC of grove base hat, sunlight sensor)
+DHT_LOCK = threading.Lock() # digital pin of temperature & humidity sensor
+RANGER_LOCK = threading.Lock() # digital pin of ultrasonic ranger (water tank)
+CAMERA_LOCK = threading.Lock() # Pi Camera
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from src.waterSystem.components import MifloraSensor, MifloraReading
+from src.waterSystem.hardware_resources import BLE_LOCK
+from src.waterSystem.sensor_reading_check import check_reading
+
+logger = logging.getLogger('water.system')
+
+DEFAULT_MIFLORA_READING_TTL_SEC = 300
+MIFLORA_POLLER_MAX_AGE_SEC = 6 * 60 * 60
+
+
+class MifloraPollerPool(object):
+    """
+    Registry of long-lived Mi Flora sensors (pollers) by MAC address with a TTL based cache of their last full reading.
+
+    A reading polls all values of a sensor with one bluetooth connection. Readings which are younger than the TTL are
+    shared by all readers (sensor job and api) instead of opening new connections.
+    Pollers are recreated after a failed poll and after `MIFLORA_POLLER_MAX_AGE_SEC`.
+    """
+
+    def __init__(self):
+        self._sensors: Dict[str, Tuple[MifloraSensor, float]] = {}  # MAC address -> (sensor, creation time)
+        self._readings: Dict[str, Tuple[MifloraReading, float]] = {}  # MAC address -> (reading, monotonic read time)
+        self._lock = threading.Lock()
+
+    def read(self, mac_address: str, ttl_sec: float = DEFAULT_MIFLORA_READING_TTL_SEC) -> MifloraReading:
+        """ Get the reading of a Mi Flora sensor - polled if there is no reading younger than ttl_sec """
+        reading = self.__cached_reading(mac_address, ttl_sec)
+        if reading is not None:
+            return reading
+
+        with BLE_LOCK:
+            # reading might have been polled by another thread in the meantime
+            reading = self.__cached_reading(mac_address, ttl_sec)
+            if reading is not None:
+                return reading
+
+            miflora = self.__get_sensor(mac_address)
+            try:
+                reading = miflora.read_all()
+            except Exception:
+                # recreate poller (and connection) on next read
+                with self._lock:
+                    self._sensors.pop(mac_address, None)
+                raise
+
+        # values out of range are dropped once when polled, so cached readings are shared without them
+        reading = check_reading(reading, f'Mi Flora sensor {mac_address}')
+        with self._lock:
+            self._readings[mac_address] = (reading, time.monotonic())
+        return reading
+
+    def __cached_reading(self, mac_address: str, ttl_sec: float) -> Optional[MifloraReading]:
+        with self._lock:
+            cached = self._readings.get(mac_address)
+        if cached is not None and time.monotonic() - cached[1] < ttl_sec:
+            return cached[0]
+        return None
+
+    def __get_sensor(self, mac_address: str) -> MifloraSensor:
+        with self._lock:
+            sensor = self._sensors.get(mac_address)
+            if sensor is None or time.monotonic() - sensor[1] > MIFLORA_POLLER_MAX_AGE_SEC:
+                logger.info(f'Creating Mi Flora poller for {mac_address}')
+                # cache of poller is refreshed explicitly for every reading
+                sensor = (MifloraSensor(mac_address, cache_timeout=MIFLORA_POLLER_MAX_AGE_SEC), time.monotonic())
+                self._sensors[mac_address] = sensor
+            return sensor[0]
+
+
+miflora_poller_pool = MifloraPollerPool()
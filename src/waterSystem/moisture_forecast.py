@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, Optional, Tuple
+
+import numpy as np
+
+from src.db.sensor_history_storage import SensorHistoryStorage
+
+FORECAST_WINDOW_HOURS = 12 # samples of the drying rate model
+FORECAST_MIN_SAMPLES = 3
+WATERING_JUMP_MOISTURE = 5 # rise of moisture in % between two samples taken as watering (model is reset)
+MIN_DRYING_RATE = 0.05 # in % per hour - plants drying slower are not forecasted
+
+# columns of the incremental sums of the linear regression (t in hours since _ORIGIN, m in %)
+_N, _T, _M, _TT, _TM = range(5)
+_ORIGIN = datetime.now().replace(microsecond=0) # keeps the sums of the regression small
+
+
+def _hours(ts: datetime) -> float:
+    return (ts - _ORIGIN).total_seconds() / 3600
+
+
+class MoistureForecast(object):
+    """
+    Drying rate model (linear regression of moisture over time) per plant over the samples of the last FORECAST_WINDOW_HOURS.
+
+    The sums of the regression are updated incrementally when a sample is added or leaves the window and are kept
+    in one matrix for all plants, so the drying rates and the forecasted crossings of all plants are computed at once.
+    The model of a plant is reset when its moisture rises by WATERING_JUMP_MOISTURE or it was watered (see `reset`).
+    """
+
+    def __init__(self):
+        self._rows: Dict[str, int] = {}  # row of plant in sums by plant id
+        self._sums = np.zeros((0, 5))
+        self._samples: Dict[str, Deque[Tuple[float, float]]] = {}  # (t, m) in window by plant id
+        self._lock = threading.Lock()
+
+    def load(self, sensor_history: SensorHistoryStorage, now: Optional[datetime] = None) -> None:
+        """ fit the models to the samples of the sensor history in the window (e.g. on startup) """
+        start = (now or datetime.now()) - timedelta(hours=FORECAST_WINDOW_HOURS)
+        for entry in sensor_history.iter_range(start, None):
+            self.add_entry(entry)
+
+    def add_entry(self, entry: dict) -> None:
+        """ add the moisture samples of the plants of a sensor history entry """
+        ts = datetime.fromisoformat(entry['ts'])
+        with self._lock:
+            for plant in entry['plants']:
+                if plant.get('moisture') is not None:
+                    self.__add_sample(plant['id'], _hours(ts), float(plant['moisture']))
+
+    def reset(self, plant_id: str) -> None:
+        """ drop the samples of a plant (e.g. after it was watered) - the model is fitted again from the next samples """
+        with self._lock:
+            row = self._rows.get(plant_id)
+            if row is not None:
+                self._samples[plant_id].clear()
+                self._sums[row] = 0.0
+
+    def drying_rates(self) -> Dict[str, float]:
+        """ drying rate in % per hour by plant id (positive if the moisture falls) - plants with too few samples are missing """
+        with self._lock:
+            slopes, _, valid = self.__fit()
+            return {plant_id: -float(slopes[row]) for plant_id, row in self._rows.items() if valid[row]}
+
+    def predict_crossings(self, min_moistures: Dict[str, float]) -> Dict[str, datetime]:
+        """ time at which the moisture of each plant is forecasted to fall below its min moisture (only plants drying at least MIN_DRYING_RATE) """
+        with self._lock:
+            plant_ids = [plant_id for plant_id in min_moistures if plant_id in self._rows]
+            if not plant_ids:
+                return {}
+            slopes, intercepts, valid = self.__fit()
+            rows = np.array([self._rows[plant_id] for plant_id in plant_ids])
+            thresholds = np.array([min_moistures[plant_id] for plant_id in plant_ids], dtype=float)
+
+            slopes, intercepts, valid = slopes[rows], intercepts[rows], valid[rows] & (slopes[rows] <= -MIN_DRYING_RATE)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                crossings = np.where(valid, (thresholds - intercepts) / slopes, np.nan)
+
+        return {plant_id: _ORIGIN + timedelta(hours=float(crossing)) for plant_id, crossing in zip(plant_ids, crossings) if not np.isnan(crossing)}
+
+    def __fit(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """ slopes, intercepts and validity of the regressions of all plants """
+        n, t, m, tt, tm = (self._sums[:, column] for column in (_N, _T, _M, _TT, _TM))
+        denominator = n * tt - t * t
+        valid = (n >= FORECAST_MIN_SAMPLES) & (denominator > 1e-9)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slopes = np.where(valid, (n * tm - t * m) / denominator, 0.0)
+            intercepts = np.where(valid, (m - slopes * t) / n, 0.0)
+        return slopes, intercepts, valid
+
+    def __add_sample(self, plant_id: str, t: float, m: float) -> None:
+        row = self._rows.get(plant_id)
+        if row is None:
+            row = self._rows[plant_id] = len(self._sums)
+            self._sums = np.vstack([self._sums, np.zeros(5)])
+            self._samples[plant_id] = deque()
+        samples = self._samples[plant_id]
+
+        if samples and t <= samples[-1][0]:
+            return  # sample is not newer than the last one
+        if samples and m - samples[-1][1] >= WATERING_JUMP_MOISTURE:
+            samples.clear()
+            self._sums[row] = 0.0
+
+        samples.append((t, m))
+        self._sums[row] += self.__terms(t, m)
+        while samples and samples[0][0] < t - FORECAST_WINDOW_HOURS:
+            self._sums[row] -= self.__terms(*samples.popleft())
+
+    @staticmethod
+    def __terms(t: float, m: float) -> np.ndarray:
+        return np.array([1.0, t, m, t * t, t * m])
+
+
+moisture_forecast = MoistureForecast()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from src.model.picture import Picture
+from src.waterSystem.components.camera import take_picture, DEFAULT_RESOLUTION, PICTURE_NAME_PREFIX
+from src.waterSystem.hardware_resources import CAMERA_LOCK
+from src.waterSystem.water_system_db_helper import get_jobs_configuration_value
+
+logger = logging.getLogger('water.system')
+
+DEFAULT_PICTURE_DIRECTORY = '../db/pictures'
+THUMBNAIL_DIRECTORY_NAME = 'thumbnails'
+DEFAULT_PICTURE_MAX_WIDTH = DEFAULT_RESOLUTION[0]
+DEFAULT_PICTURE_QUALITY = 85
+DEFAULT_THUMBNAIL_WIDTH = 320
+DEFAULT_THUMBNAIL_QUALITY = 75
+DEFAULT_PICTURE_MAX_AGE_DAYS = 90
+DEFAULT_PICTURE_MAX_TOTAL_MB = 1024
+
+PICTURE_NAME_PATTERN = re.compile(r'^' + PICTURE_NAME_PREFIX + r'[0-9T:.\-]+\.jpg$') # time of capture with or without milliseconds
+
+
+class PicturePipeline(object):
+    """
+    Capture pipeline of the Pi Camera pictures.
+
+    Captures are requested without blocking (e.g. by the scheduler) and executed one after another by a background thread:
+    the picture is captured, downscaled to `picture_max_width` and compressed (`picture_quality`), a thumbnail is
+    generated (`thumbnail_width`) and the retention is applied - pictures older than `picture_max_age_days` and the
+    oldest pictures exceeding `picture_max_total_mb` are deleted (see jobs configuration).
+    A picture is listed once it has been processed completely.
+
+    Note: pictures are neither downscaled nor compressed and no thumbnails are generated if Pillow is not installed
+    """
+
+    def __init__(self):
+        self._requests: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+
+    @property
+    def directory(self) -> str:
+        return get_jobs_configuration_value('picture_directory', DEFAULT_PICTURE_DIRECTORY)
+
+    def request_capture(self) -> None:
+        """ request a picture - returns immediately """
+        self._requests.put(None)
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self.__run, name='picture_pipeline', daemon=True)
+                self._thread.start()
+
+    def join(self) -> None:
+        """ wait until all requested pictures are processed """
+        self._requests.join()
+
+    def list_pictures(self) -> List[Picture]:
+        """ all pictures sorted by time (latest first) """
+        directory = self.directory
+        try:
+            names = [name for name in os.listdir(directory) if PICTURE_NAME_PATTERN.match(name)]
+        except FileNotFoundError:
+            return []
+
+        pictures = []
+        for name in sorted(names, reverse=True):
+            try:
+                size = os.path.getsize(os.path.join(directory, name))
+            except FileNotFoundError: # deleted by retention in the meantime
+                continue
+            pictures.append(Picture(
+                name=name,
+                ts=name[len(PICTURE_NAME_PREFIX):-len('.jpg')],
+                size=size,
+                thumbnail=os.path.exists(os.path.join(directory, THUMBNAIL_DIRECTORY_NAME, name))))
+        return pictures
+
+    def picture_path(self, name: str, thumbnail: bool = False) -> Optional[str]:
+        """ path of an existing picture (or its thumbnail) - None for unknown or invalid names """
+        if not PICTURE_NAME_PATTERN.match(name):
+            return None
+        path = os.path.join(self.directory, THUMBNAIL_DIRECTORY_NAME, name) if thumbnail else os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def apply_retention(self) -> None:
+        """ delete pictures (and thumbnails) older than max age and the oldest pictures exceeding max total size """
+        directory = self.directory
+        max_age_sec = get_jobs_configuration_value('picture_max_age_days', DEFAULT_PICTURE_MAX_AGE_DAYS) * 24 * 60 * 60
+        max_total_bytes = get_jobs_configuration_value('picture_max_total_mb', DEFAULT_PICTURE_MAX_TOTAL_MB) * 1024 * 1024
+
+        pictures = list(reversed(self.list_pictures())) # oldest first
+        total_bytes = sum(picture.size for picture in pictures)
+        now = time.time()
+        deleted = 0
+        for picture in pictures:
+            path = os.path.join(directory, picture.name)
+            if total_bytes <= max_total_bytes and now - os.path.getmtime(path) <= max_age_sec:
+                break
+            self.__delete_picture(picture.name)
+            total_bytes -= picture.size
+            deleted += 1
+
+        if deleted:
+            logger.info(f'[-PICTURE-] Deleted {deleted} pictures by retention')
+
+    def __run(self) -> None:
+        while True:
+            self._requests.get()
+            try:
+                self.__capture_and_process()
+            except Exception as exception:
+                logger.error(f'[-PICTURE-] Taking picture failed: {exception}')
+            finally:
+                self._requests.task_done()
+
+    def __capture_and_process(self) -> None:
+        directory = self.directory
+        os.makedirs(os.path.join(directory, THUMBNAIL_DIRECTORY_NAME), exist_ok=True)
+
+        with CAMERA_LOCK:
+            # captured to a hidden file - not listed until it is processed
+            capture_path = take_picture(directory, file_name=f'.capture_{threading.get_ident()}.jpg')
+        name = self.__unique_name(directory, datetime.now())
+        path = os.path.join(directory, name)
+
+        if Image is not None:
+            with Image.open(capture_path) as image:
+                thumbnail = image.copy()
+                thumbnail.thumbnail(self.__max_size(image, get_jobs_configuration_value('thumbnail_width', DEFAULT_THUMBNAIL_WIDTH)))
+                thumbnail.save(os.path.join(directory, THUMBNAIL_DIRECTORY_NAME, name), 'JPEG', quality=DEFAULT_THUMBNAIL_QUALITY, optimize=True)
+
+                picture = image.copy()
+                picture.thumbnail(self.__max_size(image, get_jobs_configuration_value('picture_max_width', DEFAULT_PICTURE_MAX_WIDTH)))
+                picture.save(capture_path, 'JPEG', quality=get_jobs_configuration_value('picture_quality', DEFAULT_PICTURE_QUALITY), optimize=True)
+        os.replace(capture_path, path)
+        logger.info(f'[-PICTURE-] Saved picture {name} ({os.path.getsize(path)} bytes)')
+
+        self.apply_retention()
+
+    def __unique_name(self, directory: str, captured_at: datetime) -> str:
+        """ name by time of capture in milliseconds - moved by a millisecond while the name is taken (e.g. clock was set back) """
+        while True:
+            name = f'{PICTURE_NAME_PREFIX}{captured_at.isoformat(timespec="milliseconds")}.jpg'
+            if not os.path.exists(os.path.join(directory, name)):
+                return name
+            captured_at += timedelta(milliseconds=1)
+
+    def __max_size(self, image, max_width: int):
+        """ max size keeping the aspect ratio of the image """
+        return max_width, max(1, round(image.height * max_width / image.width))
+
+    def __delete_picture(self, name: str) -> None:
+        for path in (os.path.join(self.directory, name), os.path.join(self.directory, THUMBNAIL_DIRECTORY_NAME, name)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+picture_pipeline = PicturePipeline()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from src.waterSystem.components import Relay
+from src.waterSystem.water_system_db_helper import get_jobs_configuration_value
+from src.waterSystem.tank_level_helper import check_tank_level
+
+logger = logging.getLogger('water.system')
+
+DEFAULT_MAX_CONCURRENT_PUMPS = 1
+PUMP_RUN_PAUSE_SEC = 0.5 # default timeout before every run of a pump
+
+
+@dataclass
+class PumpRequest:
+    pin: int
+    duration_sec: float
+    runs: int
+    completed_runs: int = 0
+    relay: Optional[Relay] = field(default=None, repr=False)
+
+
+class PumpController(object):
+    """
+    Non-blocking controller of the water pumps (relays).
+
+    Requests return immediately - the timed relay activations (pause, on, duration, off - repeated for every run)
+    are executed by one timer thread. At most `max_concurrent_pumps` pumps are running at once (power supply limit),
+    further requests are queued in order of submission. Requests for the same relay pin are run one after another.
+    The interlock is checked before a pump is switched on - the request is dropped if the interlock refuses it.
+    Both providers are called without holding the lock and the interlock is read by its own thread (they might read
+    the db or a sensor), so a slow read neither blocks `submit` nor delays the timed activations of other pumps.
+
+    Args:
+        max_concurrent_pumps(Callable): provider of the max number of pumps running at once (read on submit and before a pump is switched on)
+        interlock(Callable): provider of the reason why pumps must not be started (None if pumps are allowed)
+    """
+
+    def __init__(self, max_concurrent_pumps: Callable[[], int] = lambda: DEFAULT_MAX_CONCURRENT_PUMPS, interlock: Callable[[], Optional[str]] = lambda: None):
+        self._max_concurrent_pumps = max_concurrent_pumps
+        self._max_concurrent_pumps_value = DEFAULT_MAX_CONCURRENT_PUMPS # last value of the provider
+        self._interlock = interlock
+        self._queue: Deque[PumpRequest] = deque()
+        self._running: Dict[int, PumpRequest] = {} # by relay pin
+        self._events: List[Tuple[float, int, Callable[[], None]]] = [] # heap of (due time, sequence, action)
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._interlock_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pump_interlock')
+
+    def submit(self, pin: int, duration_sec: float, runs: int) -> None:
+        """ request to run the pump of a relay pin for duration_sec - repeated for number of runs """
+        if runs < 1:
+            return
+        self.__refresh_max_concurrent_pumps()
+        with self._condition:
+            self._queue.append(PumpRequest(pin, duration_sec, runs))
+            self.__start_queued_requests()
+            self.__ensure_thread()
+
+    def is_idle(self) -> bool:
+        with self._condition:
+            return not self._queue and not self._running
+
+    def wait_until_idle(self, timeout: Optional[float] = None) -> bool:
+        """ wait until all requests are completed - returns False on timeout """
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._queue and not self._running, timeout)
+
+    def stop_all(self) -> None:
+        """ drop queued requests and switch off all running pumps """
+        with self._condition:
+            self._queue.clear()
+            self._events.clear()
+            for request in self._running.values():
+                self.__switch_off(request)
+            self._running.clear()
+            self._condition.notify_all()
+
+    @property
+    def running_pins(self) -> List[int]:
+        with self._condition:
+            return list(self._running)
+
+    def __refresh_max_concurrent_pumps(self) -> None:
+        """ read the max number of pumps running at once (called without lock) """
+        max_concurrent_pumps = max(1, self._max_concurrent_pumps())
+        with self._condition:
+            self._max_concurrent_pumps_value = max_concurrent_pumps
+
+    def __start_queued_requests(self) -> None:
+        """ start queued requests while pumps are available (called with lock held) """
+        for request in list(self._queue):
+            if len(self._running) >= self._max_concurrent_pumps_value:
+                break
+            if request.pin in self._running:
+                continue
+            self._queue.remove(request)
+            self._running[request.pin] = request
+            self.__schedule(PUMP_RUN_PAUSE_SEC, lambda request=request: self.__switch_on(request))
+
+    def __switch_on(self, request: PumpRequest) -> None:
+        """ timed action - the interlock is read by the interlock thread, which switches on the pump """
+        self._interlock_executor.submit(self.__check_interlock_and_switch_on, request)
+
+    def __check_interlock_and_switch_on(self, request: PumpRequest) -> None:
+        try:
+            self.__refresh_max_concurrent_pumps()
+            refusal = self._interlock()
+        except Exception as exception:
+            logger.error(f'Reading interlock of water pump ({request.pin}) failed: {exception}')
+            refusal = 'interlock could not be read'
+        with self._condition:
+            if self._running.get(request.pin) is not request:
+                return # stopped while the interlock was read
+            if refusal is not None:
+                logger.warning(f'[-WATERING-] Water pump ({request.pin}) is not started: {refusal}')
+                self.__complete(request)
+                return
+            try:
+                if request.relay is None:
+                    request.relay = Relay(request.pin)
+                request.relay.on()
+            except Exception as exception:
+                logger.error(f'Running water pump ({request.pin}) failed: {exception}')
+                self.__switch_off(request)
+                self.__complete(request)
+                return
+            self.__schedule(request.duration_sec, lambda: self.__finish_run(request))
+
+    def __finish_run(self, request: PumpRequest) -> None:
+        with self._condition:
+            if self._running.get(request.pin) is not request:
+                return # stopped (switched off by stop_all)
+            self.__switch_off(request)
+            request.completed_runs += 1
+            if request.completed_runs < request.runs:
+                self.__schedule(PUMP_RUN_PAUSE_SEC, lambda: self.__switch_on(request))
+            else:
+                self.__complete(request)
+
+    def __switch_off(self, request: PumpRequest) -> None:
+        if request.relay is None:
+            return
+        try:
+            request.relay.off()
+        except Exception as exception:
+            logger.error(f'Switching off water pump ({request.pin}) failed: {exception}')
+
+    def __complete(self, request: PumpRequest) -> None:
+        if self._running.get(request.pin) is request:
+            del self._running[request.pin]
+        self.__start_queued_requests()
+        self._condition.notify_all()
+
+    def __schedule(self, delay_sec: float, action: Callable[[], None]) -> None:
+        """ schedule an action of the timer thread (called with lock held) """
+        heapq.heappush(self._events, (time.monotonic() + delay_sec, next(self._sequence), action))
+        self._condition.notify_all()
+
+    def __ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self.__run, name='pump_controller', daemon=True)
+            self._thread.start()
+
+    def __run(self) -> None:
+        """ timer thread - execute due actions (actions take the lock themselves) """
+        while True:
+            with self._condition:
+                action = self.__wait_for_due_action()
+            try:
+                action()
+            except Exception as exception:
+                logger.error(f'Water pump action failed: {exception}')
+
+    def __wait_for_due_action(self) -> Callable[[], None]:
+        """ wait for the next due action and remove it from the events (called with lock held) """
+        while True:
+            if not self._events:
+                self._condition.wait()
+                continue
+            due, _, action = self._events[0]
+            delay = due - time.monotonic()
+            if delay > 0:
+                self._condition.wait(delay)
+                continue
+            heapq.heappop(self._events)
+            return action
+
+
+pump_controller = PumpController(lambda: get_jobs_configuration_value('max_concurrent_pumps', DEFAULT_MAX_CONCURRENT_PUMPS), check_tank_level)
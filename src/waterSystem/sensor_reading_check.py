@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+
+import logging
+from typing import TypeVar
+
+from src.waterSystem.components import SensorReading
+
+logger = logging.getLogger('water.system')
+
+R = TypeVar('R', bound=SensorReading)
+
+
+def check_reading(reading: R, source: str) -> R:
+    """
+    drop the values of a reading which are out of the range of plausible values of their field (e.g. moisture above 100 %)
+    Note: every dropped value is logged with its field - the valid values of the reading are kept
+    """
+    out_of_range_fields = reading.out_of_range_fields()
+    for field_name in out_of_range_fields:
+        logger.warning(f'[-SENSOR-] Invalid {field_name} of {source}: {getattr(reading, field_name)} is out of range and is not used')
+    return reading.without_out_of_range_values() if out_of_range_fields else reading
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from src.db.db_adapter import DbAdapter
+from src.model.tank_level_entry import TankLevelEntry
+from src.waterSystem.components import UltrasonicRanger
+from src.waterSystem.hardware_resources import RANGER_LOCK
+from src.waterSystem.sensor_reading_check import check_reading
+from src.waterSystem.water_system_db_helper import get_jobs_configuration_value
+
+logger = logging.getLogger('water.system')
+
+DEFAULT_TANK_LEVEL_SAMPLES = 5
+DEFAULT_MIN_TANK_LEVEL = 10 # in %
+DEFAULT_TANK_FULL_DISTANCE_CM = 1.5
+DEFAULT_TANK_EMPTY_DISTANCE_CM = 11
+TANK_LEVEL_MAX_AGE_MIN = 30 # max age of a tank level used for the pump interlock
+
+#######################################################
+# helper functions for persisting water tank level db #
+#######################################################
+
+
+def query_and_persist_tank_level() -> Optional[TankLevelEntry]:
+    """
+    measure water level of the tank (median of several measurements of the ultrasonic ranger) and persist it to tank level history db
+    Note: does nothing if no ultrasonic ranger is configured (`tank_ranger_pin` of jobs configuration)
+    """
+    pin = get_jobs_configuration_value('tank_ranger_pin', None)
+    if pin is None:
+        return None
+
+    ultrasonic_ranger = UltrasonicRanger(
+        pin,
+        max_water_level_cm=get_jobs_configuration_value('tank_full_distance_cm', DEFAULT_TANK_FULL_DISTANCE_CM),
+        min_water_level_cm=get_jobs_configuration_value('tank_empty_distance_cm', DEFAULT_TANK_EMPTY_DISTANCE_CM))
+    with RANGER_LOCK:
+        reading = ultrasonic_ranger.read_median(get_jobs_configuration_value('tank_level_samples', DEFAULT_TANK_LEVEL_SAMPLES))
+    reading = check_reading(reading, 'ultrasonic ranger')
+    water_level = reading.water_level if reading.distance is not None else None # derived from the (invalid) distance
+
+    tank_level_entry_obj = TankLevelEntry(ts=reading.read_at.isoformat(timespec='seconds'), distance=reading.distance, water_level=water_level)
+    DbAdapter().tank_level_history.insert(tank_level_entry_obj.dict())
+    if water_level is None:
+        logger.warning('[-TANK-] Water level of tank could not be measured (no echo of ultrasonic ranger or distance out of range)')
+    else:
+        logger.info(f'[-TANK-] Water level of tank: {water_level} % (distance: {reading.distance} cm)')
+    return tank_level_entry_obj
+
+
+def get_latest_tank_level() -> Optional[TankLevelEntry]:
+    latest_entry = DbAdapter().tank_level_history.latest()
+    return TankLevelEntry.parse_obj(latest_entry) if latest_entry is not None else None
+
+
+#############################################
+# helper functions for water pump interlock #
+#############################################
+
+
+def check_tank_level() -> Optional[str]:
+    """
+    interlock of the water pumps - get the reason why pumps must not be started (water level of tank below `min_tank_level`)
+    Note: pumps are allowed (with a warning) if the water level is unknown or older than TANK_LEVEL_MAX_AGE_MIN
+    """
+    if get_jobs_configuration_value('tank_ranger_pin', None) is None:
+        return None
+
+    min_tank_level = get_jobs_configuration_value('min_tank_level', DEFAULT_MIN_TANK_LEVEL)
+    tank_level = get_latest_tank_level()
+    if tank_level is None or tank_level.water_level is None or datetime.fromisoformat(tank_level.ts) < datetime.now() - timedelta(minutes=TANK_LEVEL_MAX_AGE_MIN):
+        logger.warning('[-TANK-] Water level of tank is unknown - water pump is started anyway')
+        return None
+    if tank_level.water_level < min_tank_level:
+        return f'water level of tank {tank_level.water_level} % is below min {min_tank_level} %'
+    return None
@@ -1,124 +1,250 @@
 #!/usr/bin/env python3
 
 import logging
-from tinydb.queries import Query
+import threading
 from src.model.plant_entry import PlantSensorEntry, Plant
-from src.model.plant_configuration import PlantConfiguration
 
-from typing import List
+from typing import Dict, List, Optional, Set, Tuple
+from concurrent.futures import Executor, ThreadPoolExecutor
 
 from datetime import datetime, timedelta
-from tinydb import table
-from src.db.db_adapter import DbAdapter, SENSOR_HISTORY_TABLE_NAME, PLANTS_CONFIGURATION_TABLE_NAME, SCHEDULED_JOBS_CONFIGURATION_TABLE_NAME
+from src.db.db_adapter import DbAdapter, SCHEDULED_JOBS_CONFIGURATION_TABLE_NAME
+from src.db.plant_configuration_cache import PlantConfigurationCache
+from src.model.plant_configuration import PlantConfiguration
+from src.model.rollup_resolution import RollupResolution
+from src.waterSystem.hardware_resources import I2C_LOCK, DHT_LOCK
+from src.waterSystem.miflora_poller_pool import miflora_poller_pool, DEFAULT_MIFLORA_READING_TTL_SEC
+from src.waterSystem.sensor_reading_check import check_reading
 
 from src.waterSystem.components import TemperatureHumiditySensor, TempHumSensorType
-from src.waterSystem.components import MoistureSensor
-from src.waterSystem.components import MifloraSensor
+from src.waterSystem.components import MoistureSensor, AdcSampler
+from src.waterSystem.components.adc_sampler import REDUCTION_MEDIAN
 from src.waterSystem.components import SunlightSensor
+from src.waterSystem.components import TemperatureHumidityReading, SunlightReading
 
 logger = logging.getLogger('water.system')
 
+DEFAULT_SENSOR_POLLING_MAX_WORKERS = 4
+DEFAULT_MOISTURE_SAMPLES = 9
+DEFAULT_RAW_HISTORY_WEEKS = 26
+DEFAULT_HOURLY_ROLLUP_MONTHS = 24
+
+LATEST_PLANT_READINGS_LOOKBACK_HOURS = 24
+
+# latest reading of every plant by plant id: (ts, plant) - read on first use
+_latest_plants: Optional[Dict[str, Tuple[str, Plant]]] = None
+_latest_plants_lock = threading.Lock()
+
+# shared ADC sampler of moisture sensors (created on first use)
+_adc_sampler = None
+_adc_sampler_configuration = None
+
 ##############################################################
 # helper functions for persisting to sensor history database #
 ##############################################################
 
 
-def query_and_persist_sensor_values() -> None:
+def query_and_persist_sensor_values(plant_ids: Optional[Set[str]] = None) -> PlantSensorEntry:
     """ 
     persist sensor value to sensor history database
     specific sensor parameters/configurations are read out from master database (plants configurations)
+    Note: only the plants of the given ids are polled if plant_ids is set (e.g. by the adaptive sampler)
+
+    Sensors of different hardware resources (bluetooth adapter, I2C bus, DHT pin) are polled concurrently 
+    by a thread pool (max workers: `sensor_polling_max_workers` of jobs configuration). 
+    Sensors sharing the same hardware resource are polled one after another.
     """
 
-    # history db connection
-    plant_db = DbAdapter().plant_db
-    sensor_history_db = plant_db.table(SENSOR_HISTORY_TABLE_NAME)
+    ts = datetime.now().isoformat(timespec='seconds') # time stamp of start of sampling round
+    max_workers = get_jobs_configuration_value('sensor_polling_max_workers', DEFAULT_SENSOR_POLLING_MAX_WORKERS)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sensor_polling') as executor:
+        temp_hum_future = executor.submit(__read_temperature_humidity_sensor)
+        sunlight_future = executor.submit(__read_sunlight_sensor)
+        plants = __create_plants_entries_list(executor, plant_ids)
+        temp_hum_reading = temp_hum_future.result()
+        sunlight_reading = sunlight_future.result()
 
-    temp_sensor = TemperatureHumiditySensor(channel=16, sensor_type=TempHumSensorType.STANDARD.value)
-    sunlight_sensor = SunlightSensor()
-    
     plant_sensor_entry_obj = PlantSensorEntry(
-        ts=datetime.now().isoformat(timespec='seconds'),
-        plants=__create_plants_entries_list(),
-        temperature=temp_sensor.read_temperature(),
-        humidity=temp_sensor.read_humidity(),
-        visible_light=sunlight_sensor.readVisible(),
-        UV_index=sunlight_sensor.readUV(),
-        IR_light=sunlight_sensor.readIR()
+        ts=ts,
+        plants=plants,
+        temperature=temp_hum_reading.temperature,
+        humidity=temp_hum_reading.humidity,
+        visible_light=sunlight_reading.visible_light,
+        UV_index=sunlight_reading.uv_index,
+        IR_light=sunlight_reading.ir_light
     )
 
-    # query and save values with time stamp to db
-    sensor_history_db.insert(plant_sensor_entry_obj.dict(exclude_none=True))
+    # save values with time stamp to db
+    persist_sensor_entry(plant_sensor_entry_obj)
     logger.info('Sensor values successfully queried and persistet in db')
+    return plant_sensor_entry_obj
+
+
+def persist_sensor_entry(plant_sensor_entry_obj: PlantSensorEntry) -> None:
+    """ insert an entry into the sensor history database and add it to the rollups """
+    plant_sensor_entry = plant_sensor_entry_obj.dict(exclude_none=True)
+    DbAdapter().sensor_history.insert(plant_sensor_entry)
+    for sensor_history_rollup in DbAdapter().sensor_history_rollups.values():
+        sensor_history_rollup.add_entry(plant_sensor_entry)
+    with _latest_plants_lock:
+        if _latest_plants is not None:
+            for plant in plant_sensor_entry_obj.plants:
+                if plant.id not in _latest_plants or _latest_plants[plant.id][0] <= plant_sensor_entry_obj.ts:
+                    _latest_plants[plant.id] = (plant_sensor_entry_obj.ts, plant)
 
 
-def __create_plants_entries_list() -> List[Plant]:
-    """ create a list with all configured plants and its sensor values - sorted by entry doc_id"""
+def get_latest_plant_readings() -> Dict[str, Plant]:
+    """
+    latest reading of every plant by plant id - entries of the sensor history might not contain all plants (adaptive sampling)
+    Note: read once from the last LATEST_PLANT_READINGS_LOOKBACK_HOURS (or the latest entry) of the sensor history and maintained on insert afterwards
+    """
+    global _latest_plants
+    with _latest_plants_lock:
+        if _latest_plants is None:
+            _latest_plants = {}
+            sensor_history_db = DbAdapter().sensor_history
+            entries = list(sensor_history_db.iter_range(datetime.now() - timedelta(hours=LATEST_PLANT_READINGS_LOOKBACK_HOURS), None))
+            if not entries and sensor_history_db.latest() is not None:
+                entries = [sensor_history_db.latest()] # no sensor values queried recently
+            for entry in entries:
+                for plant in entry['plants']:
+                    _latest_plants[plant['id']] = (entry['ts'], Plant.parse_obj(plant))
+        return {plant_id: plant for plant_id, (_, plant) in _latest_plants.items()}
+
+
+def __create_plants_entries_list(executor: Executor, plant_ids: Optional[Set[str]] = None) -> List[Plant]:
+    """ create a list with all configured plants (or the plants of the given ids) and its sensor values - sorted by entry doc_id"""
+
+    # cached plants configuration
+    plant_configurations = DbAdapter().plant_configurations
+    configurations = [conf for conf in plant_configurations.all() if plant_ids is None or conf.id in plant_ids]
 
-    # master data db connection
-    master_data_db = DbAdapter().master_data_db
-    plants_master_data_db = master_data_db.table(PLANTS_CONFIGURATION_TABLE_NAME)
+    miflora_plants_future = executor.submit(__poll_miflora_plants, [conf for conf in configurations if conf.mac_adress])
+    grove_plants_future = executor.submit(__poll_grove_plants, [conf for conf in configurations if not conf.mac_adress])
+    plants = miflora_plants_future.result() + grove_plants_future.result()
+
+    return sorted(plants, key=lambda p: __plant_entry_sorter(p, plant_configurations))
+
+
+def __poll_miflora_plants(plant_configurations: List[PlantConfiguration]) -> List[Plant]:
+    """ poll miflora sensors one after another (bluetooth adapter) - readings younger than the configured ttl are shared """
+    ttl_sec = get_jobs_configuration_value('miflora_reading_ttl_sec', DEFAULT_MIFLORA_READING_TTL_SEC)
+
+    plants: List[Plant] = []
+    for plant_configuration_obj in plant_configurations:
+        reading = miflora_poller_pool.read(plant_configuration_obj.mac_adress, ttl_sec)
+        plants.append(Plant(
+            id=plant_configuration_obj.id, 
+            name=plant_configuration_obj.plant,
+            moisture=reading.moisture, 
+            conductivity=reading.conductivity, 
+            sunlight=reading.sunlight, 
+            temperature=reading.temperature, 
+            batteryLevel=reading.battery_level))
+    return plants
+
+
+def __poll_grove_plants(plant_configurations: List[PlantConfiguration]) -> List[Plant]:
+    """ poll grove moisture sensors - all channels are sampled in one pass by the shared ADC sampler (ADC on I2C bus) """
+    if not plant_configurations:
+        return []
+
+    adc_sampler = __get_adc_sampler()
+    with I2C_LOCK:
+        voltages = adc_sampler.read_voltages([plant_configuration_obj.sensor_channel for plant_configuration_obj in plant_configurations])
 
     plants: List[Plant] = []
-    for plant_conf in plants_master_data_db:
-
-        # parse plant_conf Document to object
-        plant_configuration_obj = PlantConfiguration.parse_obj(plant_conf)
-        # miflora sensor
-        if plant_configuration_obj.mac_adress:
-            # to poll data from miflora sensor a new object has to be created for each poll
-            miflora = MifloraSensor(plant_configuration_obj.mac_adress)
-
-            moisture = miflora.read_moisture()
-            conductivity = miflora.read_conductivity()
-            sunlight = miflora.read_sunlight()
-            temperature = miflora.read_temperature()
-            battery_level = miflora.get_battery_level()
-
-            plants.append(Plant(
-                id=plant_configuration_obj.id, 
-                name=plant_configuration_obj.plant,
-                moisture=moisture, 
-                conductivity=conductivity, 
-                sunlight=sunlight, 
-                temperature=temperature, 
-                batteryLevel=battery_level))
-        else:  # grove sensor
-            mositure_sensor = MoistureSensor(channel=plant_configuration_obj.sensor_channel, sensor_type=plant_configuration_obj.sensor_type)
-            moisture = mositure_sensor.read_moisture()
-
-            plants.append(Plant(id=plant_configuration_obj.id, name=plant_configuration_obj.plant, moisture=moisture))
-            
-    return sorted(plants, key=lambda p: __plant_entry_sorter(p, plants_master_data_db))
-
-def __plant_entry_sorter(plant: Plant, plants_master_data_db: table.Table) -> int:
+    for plant_configuration_obj in plant_configurations:
+        mositure_sensor = MoistureSensor(channel=plant_configuration_obj.sensor_channel, sensor_type=plant_configuration_obj.sensor_type, adc=adc_sampler.adc)
+        reading = check_reading(mositure_sensor.convert_voltage(voltages[plant_configuration_obj.sensor_channel]), plant_configuration_obj.plant)
+
+        plants.append(Plant(id=plant_configuration_obj.id, name=plant_configuration_obj.plant, moisture=reading.moisture))
+    return plants
+
+
+def __get_adc_sampler() -> AdcSampler:
+    """ get shared ADC sampler - created on first use or if its sampling configuration changed """
+    global _adc_sampler, _adc_sampler_configuration
+    configuration = (
+        get_jobs_configuration_value('moisture_samples', DEFAULT_MOISTURE_SAMPLES),
+        get_jobs_configuration_value('moisture_sample_reduction', REDUCTION_MEDIAN)
+    )
+    if _adc_sampler is None or _adc_sampler_configuration != configuration:
+        _adc_sampler = AdcSampler(*configuration)
+        _adc_sampler_configuration = configuration
+    return _adc_sampler
+
+
+def __read_temperature_humidity_sensor() -> TemperatureHumidityReading:
+    with DHT_LOCK:
+        temp_sensor = TemperatureHumiditySensor(channel=16, sensor_type=TempHumSensorType.STANDARD.value)
+        reading = temp_sensor.read_all()
+    return check_reading(reading, 'temperature & humidity sensor')
+
+
+def __read_sunlight_sensor() -> SunlightReading:
+    with I2C_LOCK:
+        sunlight_sensor = SunlightSensor()
+        reading = sunlight_sensor.read_all()
+    return check_reading(reading, 'sunlight sensor')
+
+
+def __plant_entry_sorter(plant: Plant, plant_configurations: PlantConfigurationCache) -> int:
     """ sorter function for plant entries list. Sort by doc_id"""
-    plant_query = Query()
-    plant_entry = plants_master_data_db.get(plant_query.id == plant.id)
-    plant_seq = plant_entry.doc_id
+    plant_seq = plant_configurations.doc_id(plant.id)
     if not plant_seq is None:
         return plant_seq
     else:
         return -1
 
 
+###########################################
+# helper functions for jobs configuration #
+###########################################
+
+def get_jobs_configuration_value(key: str, default):
+    """ get a value of the jobs configuration (doc_id 1) - or the default if it is not configured """
+    db_adapter = DbAdapter()
+    with db_adapter.storage_writer.lock:
+        jobs_configuration = db_adapter.master_data_db.table(SCHEDULED_JOBS_CONFIGURATION_TABLE_NAME).get(doc_id=1)
+    if jobs_configuration is None:
+        return default
+    return jobs_configuration.get(key, default)
+
+
 #########################################################
 # helper functions for clean up sensor history database #
 #########################################################
 
 def clean_up_plant_history() -> None:
-    # history db connection
-    plant_db = DbAdapter().plant_db
-    sensor_history_db = plant_db.table(SENSOR_HISTORY_TABLE_NAME)
-    # master db connection
-    master_data_db = DbAdapter().master_data_db
-    plants_master_data_db = master_data_db.table(SCHEDULED_JOBS_CONFIGURATION_TABLE_NAME)
-
-    max_months = plants_master_data_db.get(doc_id=1)['max_plant_history_months']
-    min_date = datetime.now() - timedelta(weeks=max_months*4)
-    sensor_entry = Query()
-
-    # delete all entries which are older than max_months
-    test_max_entry= lambda plant_history_entry_ts: datetime.fromisoformat(plant_history_entry_ts) < min_date 
-    sensor_history_db.remove(sensor_entry.ts.test(test_max_entry))
-    
-    logger.info(f'[-Clean up plant history-] Sucessfully cleared plant history entries older than: {min_date}')
+    """
+    tiered retention of the sensor history (see jobs configuration):
+    raw entries are kept for `raw_history_weeks`, hourly rollups for `hourly_rollup_months` and daily rollups forever.
+    Raw entries are only dropped once they are rolled up - whole segments of expired partitions are dropped.
+    """
+    sensor_history_db = DbAdapter().sensor_history
+    hourly_rollup = DbAdapter().sensor_history_rollups[RollupResolution.hour]
+    daily_rollup = DbAdapter().sensor_history_rollups[RollupResolution.day]
+
+    raw_min_date = datetime.now() - timedelta(weeks=__raw_history_weeks())
+    rolled_up_until = [rollup.completed_until for rollup in (hourly_rollup, daily_rollup)]
+    if None in rolled_up_until:
+        logger.warning('[-Clean up plant history-] Sensor history is not rolled up yet - skipping clean up of raw entries')
+    else:
+        raw_min_date = min([raw_min_date] + rolled_up_until)
+        removed_ids = sensor_history_db.drop_before(raw_min_date)
+        logger.info(f'[-Clean up plant history-] Dropped {len(removed_ids)} raw plant history entries older than: {raw_min_date}')
+
+    hourly_min_date = datetime.now() - timedelta(weeks=get_jobs_configuration_value('hourly_rollup_months', DEFAULT_HOURLY_ROLLUP_MONTHS) * 4)
+    removed_ids = hourly_rollup.storage.drop_before(hourly_min_date)
+    logger.info(f'[-Clean up plant history-] Dropped {len(removed_ids)} hourly rollups older than: {hourly_min_date}')
+
+    tank_min_date = datetime.now() - timedelta(weeks=__raw_history_weeks())
+    DbAdapter().tank_level_history.drop_before(tank_min_date)
+
+
+def __raw_history_weeks() -> int:
+    """ weeks of raw sensor history - falls back to the former setting `max_plant_history_months` """
+    max_months = get_jobs_configuration_value('max_plant_history_months', None)
+    return get_jobs_configuration_value('raw_history_weeks', max_months * 4 if max_months is not None else DEFAULT_RAW_HISTORY_WEEKS)
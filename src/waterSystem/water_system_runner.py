@@ -1,12 +1,21 @@
 #!/usr/bin/env python3
 
+import logging
+from datetime import datetime, timedelta
+
 from src.model.water_system_state import WaterSystemState
+from src.model.plant_entry import PlantSensorEntry
+from src.db.db_adapter import DbAdapter
 from apscheduler.schedulers.blocking import BlockingScheduler
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_MISSED
-from src.waterSystem.water_level_helper import run_water_check, run_water_chron
-from src.waterSystem.water_system_db_helper import query_and_persist_sensor_values, clean_up_plant_history
-from src.waterSystem.components.camera import take_picture
+from src.waterSystem.water_level_helper import run_water_check, run_water_chron, run_forecast_water_check
+from src.waterSystem.water_system_db_helper import query_and_persist_sensor_values, clean_up_plant_history, get_jobs_configuration_value
+from src.waterSystem.adaptive_sampler import adaptive_sampler
+from src.waterSystem.moisture_forecast import moisture_forecast
+from src.waterSystem.picture_pipeline import picture_pipeline
+from src.waterSystem.pump_controller import pump_controller
+from src.waterSystem.tank_level_helper import query_and_persist_tank_level
 
 from src.log.logger import setup_logger
 
@@ -14,30 +23,50 @@ from src.log.logger import setup_logger
 setup_logger('water.system', '../log/water_system.log')
 # setup apscheduler logger
 setup_logger('apscheduler', '../log/water_system.log')
+logger = logging.getLogger('water.system')
 
 QUERY_SENSOR_VALUES_INTERVAL_MIN = 42
+ADAPTIVE_SAMPLING_TICK_MIN = 1 # plants are sampled by the adaptive sampler as soon as they are due
 RUN_WATER_SYSTEM_INTERVAL_MIN = 60
 RUN_WATER_CHRON_INTERVAL_HOURS = 27
-RUN_PLANT_DB_CLEAN_UP_INTERVAL_WEEKS = 2
+RUN_PLANT_DB_CLEAN_UP_INTERVAL_DAYS = 1 # retention only drops whole expired segments
+QUERY_TANK_LEVEL_INTERVAL_MIN = 10
+FORECAST_WATERING_HORIZON_HOURS = 24 # max time ahead a forecasted watering is scheduled
+FORECAST_WATERING_JOB_ID_PREFIX = 'forecast_watering_'
 
 # create scheduler (deafult BackgroundScheduler as daemon)
 sched = BackgroundScheduler(daemon=True)
+# plants are watered at the forecasted crossing of their min moisture (see schedule_forecast_watering)
+forecast_watering = False
 
 def run_query_and_persist_sensor_values() -> None:
-    query_and_persist_sensor_values()
+    schedule_forecast_watering(query_and_persist_sensor_values())
+
+def run_adaptive_sampling() -> None:
+    plant_sensor_entry_obj = adaptive_sampler.run()
+    if plant_sensor_entry_obj is not None:
+        schedule_forecast_watering(plant_sensor_entry_obj)
 
 def run_water_system() -> None:
     run_water_check()
 
+def run_forecast_watering(plant_id: str) -> None:
+    if run_forecast_water_check(plant_id):
+        # the samples before the watering would forecast the same (past) crossing again
+        moisture_forecast.reset(plant_id)
+
 def run_water_system_chron() -> None:
     run_water_chron()
 
 def pi_camera_take_picture() -> None:
-    take_picture()
+    picture_pipeline.request_capture()
 
 def run_plant_db_clean_up() -> None:
     clean_up_plant_history()
 
+def run_query_and_persist_tank_level() -> None:
+    query_and_persist_tank_level()
+
 
 def get_state_of_water_system() -> WaterSystemState:
     return WaterSystemState(sched.state)
@@ -50,6 +79,7 @@ def resume_water_system() -> None:
 
 def shutdown_water_system() -> None:
     sched.shutdown()
+    pump_controller.stop_all()
     
 
 def job_state_listener(event) -> None:
@@ -59,20 +89,64 @@ def job_state_listener(event) -> None:
         print(f'EVENT_JOB_MISSED! {event}')
 
 
+#########################
+### forecast watering ###
+#########################
+
+def schedule_forecast_watering(plant_sensor_entry_obj: PlantSensorEntry) -> None:
+    """
+    add the moisture of the plants to the moisture forecast and schedule a one-off watering of every activated plant
+    at the forecasted crossing of its min moisture (rescheduled on every sample, removed if no crossing is forecasted anymore)
+    Note: plants whose moisture is below min moisture already are watered by the water check,
+    a crossing forecasted in the past while the measured moisture is above min moisture is not scheduled (outdated model)
+    """
+    if not forecast_watering:
+        return
+    moisture_forecast.add_entry(plant_sensor_entry_obj.dict(exclude_none=True))
+
+    now = datetime.now()
+    plants = {plant.id: plant for plant in plant_sensor_entry_obj.plants}
+    plant_configurations = [conf for conf in DbAdapter().plant_configurations.all() if conf.activated and conf.id in plants]
+    crossings = moisture_forecast.predict_crossings({conf.id: conf.min_moisture for conf in plant_configurations})
+
+    for plant_configuration_obj in plant_configurations:
+        job_id = FORECAST_WATERING_JOB_ID_PREFIX + plant_configuration_obj.id
+        crossing = crossings.get(plant_configuration_obj.id)
+        if plants[plant_configuration_obj.id].moisture is None:
+            continue # invalid moisture reading - model and scheduled watering are unchanged
+        if crossing is None or crossing <= now or crossing > now + timedelta(hours=FORECAST_WATERING_HORIZON_HOURS) or plants[plant_configuration_obj.id].moisture < plant_configuration_obj.min_moisture:
+            if sched.get_job(job_id) is not None:
+                sched.remove_job(job_id)
+            continue
+
+        run_date = crossing
+        if sched.get_job(job_id) is None:
+            logger.info(f'[-WATERING-] Moisture of {plant_configuration_obj.plant} is forecasted to fall below min {plant_configuration_obj.min_moisture} % at {run_date.isoformat(timespec="minutes")}')
+        sched.add_job(run_forecast_watering, 'date', run_date=run_date, args=[plant_configuration_obj.id], id=job_id, replace_existing=True)
+
+
 #####################
 ### job scheduler ###
 #####################
 
 def set_up_sched_jobs(chron: bool):
-    sched.add_job(run_query_and_persist_sensor_values, 'interval', minutes=QUERY_SENSOR_VALUES_INTERVAL_MIN, id='query_and_persist_sensor_values')
+    global forecast_watering
+    if get_jobs_configuration_value('adaptive_sampling', False):
+        sched.add_job(run_adaptive_sampling, 'interval', minutes=ADAPTIVE_SAMPLING_TICK_MIN, id='query_and_persist_sensor_values')
+    else:
+        sched.add_job(run_query_and_persist_sensor_values, 'interval', minutes=QUERY_SENSOR_VALUES_INTERVAL_MIN, id='query_and_persist_sensor_values')
+    sched.add_job(run_query_and_persist_tank_level, 'interval', minutes=QUERY_TANK_LEVEL_INTERVAL_MIN, id='query_and_persist_tank_level')
 
     if chron == True: # TODO: Refactor
         sched.add_job(run_water_system_chron, 'interval', hours=RUN_WATER_CHRON_INTERVAL_HOURS, id='water_chron')
         sched.add_job(pi_camera_take_picture, 'interval', hours=12, id='take_picture')
     else:
         sched.add_job(run_water_system, 'interval', minutes=RUN_WATER_SYSTEM_INTERVAL_MIN, id='water_check')
+        forecast_watering = get_jobs_configuration_value('forecast_watering', False)
+        if forecast_watering:
+            moisture_forecast.load(DbAdapter().sensor_history)
 
-    sched.add_job(run_plant_db_clean_up, 'interval', weeks=RUN_PLANT_DB_CLEAN_UP_INTERVAL_WEEKS, id='run_plant_db_clean_up')
+    sched.add_job(run_plant_db_clean_up, 'interval', days=RUN_PLANT_DB_CLEAN_UP_INTERVAL_DAYS, id='run_plant_db_clean_up')
     sched.add_listener(job_state_listener, EVENT_JOB_ERROR | EVENT_JOB_MISSED)
 
 def start_water_system_daemon():
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import builtins
+import logging
+
+from src.log import log_search
+from src.log.log_search import search_log
+from src.log.logger import INDEX_HEADER, INDEX_RECORD, IndexedRotatingFileHandler, index_file_path
+
+_START = 1700000000.0
+
+
+def _write_log(log_file_path: str, count: int) -> None:
+    handler = IndexedRotatingFileHandler(log_file_path)
+    handler.setFormatter(logging.Formatter('%(levelname)s - %(message)s'))
+    for number in range(count):
+        tag = 'WATERING' if number % 2 else 'SENSOR'
+        record = logging.makeLogRecord({'msg': f'[-{tag}-] entry {number}', 'levelno': logging.WARNING if number % 10 == 0 else logging.INFO,
+                                        'levelname': 'WARNING' if number % 10 == 0 else 'INFO', 'created': _START + number})
+        handler.handle(record)
+    handler.close()
+
+
+def test_search_by_time_level_and_tag(tmp_path):
+    log_file_path = str(tmp_path / 'water_system.log')
+    _write_log(log_file_path, 100)
+
+    entries = list(search_log(log_file_path, start=_START + 10, end=_START + 30, min_level=logging.WARNING))
+    assert [entry['entry'].strip() for entry in entries] == ['WARNING - [-SENSOR-] entry 10', 'WARNING - [-SENSOR-] entry 20']
+    assert [entry['tag'] for entry in entries] == ['SENSOR', 'SENSOR']
+
+    entries = list(search_log(log_file_path, start=_START + 10, end=_START + 14, tag='WATERING', texts=['ENTRY 13']))
+    assert [entry['ts'] for entry in entries] == [_START + 13]
+    assert list(search_log(log_file_path, tag='PICTURE')) == []
+
+
+def test_narrow_time_range_reads_bounded_part_of_index(tmp_path, monkeypatch):
+    log_file_path = str(tmp_path / 'water_system.log')
+    _write_log(log_file_path, 20000)
+
+    index_bytes_read = []
+
+    class CountingFile(object):
+        def __init__(self, file):
+            self._file = file
+
+        def read(self, size=-1):
+            data = self._file.read(size)
+            if self._file.name == index_file_path(log_file_path):
+                index_bytes_read.append(len(data))
+            return data
+
+        def __getattr__(self, name):
+            return getattr(self._file, name)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            self._file.close()
+
+    monkeypatch.setattr(log_search, 'open', lambda *args, **kwargs: CountingFile(builtins.open(*args, **kwargs)), raising=False)
+
+    entries = list(search_log(log_file_path, start=_START + 12000, end=_START + 12005))
+    assert len(entries) == 5
+    # header, two bisections of about log2(20000) records each and the records of the range
+    assert sum(index_bytes_read) <= len(INDEX_HEADER) + (2 * 16 + 5) * INDEX_RECORD.size
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+import resource
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.db.segmented_sensor_history import SegmentedSensorHistory
+
+_START = datetime(2023, 1, 1, 12)
+
+
+def _entry(ts: datetime, moisture: float = 42.0) -> dict:
+    return {'ts': ts.isoformat(timespec='seconds'), 'plants': [{'id': 'plant-1', 'name': 'Basil', 'moisture': moisture}]}
+
+
+def _daily_history(path, days: int) -> SegmentedSensorHistory:
+    history = SegmentedSensorHistory(str(path))
+    history.import_documents(_entry(_START + timedelta(days=day)) for day in range(days))
+    return history
+
+
+@pytest.fixture
+def low_open_file_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (64, hard))
+    yield 64
+    resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+
+
+def test_reading_more_segments_than_open_file_limit(tmp_path, low_open_file_limit):
+    days = 4 * low_open_file_limit
+    history = _daily_history(tmp_path, days)
+
+    assert len(history.range()) == days
+    assert len(list(history.iter_raw_range())) == days
+    assert len(list(history)) == days
+    assert len(history.search(lambda document: True)) == days
+
+
+def test_reader_survives_concurrent_drop_and_remove(tmp_path):
+    history = _daily_history(tmp_path, 10)
+    documents = history.iter_range()
+    raw_documents = history.iter_raw_range()
+    all_documents = iter(history)
+    first = [next(documents), next(raw_documents), next(all_documents)]
+
+    history.drop_before(_START + timedelta(days=3))
+    history.remove(lambda document: document['ts'] == _entry(_START + timedelta(days=5))['ts'])
+
+    assert first[0]['ts'] == _entry(_START)['ts']
+    assert [document['ts'] for document in documents] == [_entry(_START + timedelta(days=day))['ts'] for day in (3, 4, 6, 7, 8, 9)]
+    assert len(list(raw_documents)) == 6
+    assert len(list(all_documents)) == 6
+
+
+def test_reader_skips_documents_inserted_after_the_call(tmp_path):
+    history = _daily_history(tmp_path, 3)
+    all_documents = iter(history)
+    history.insert(_entry(_START + timedelta(days=1, hours=1)))
+
+    assert len(list(all_documents)) == 3
+
+
+def test_new_segment_is_listed_in_manifest_before_its_lines_are_written(tmp_path, monkeypatch):
+    history = _daily_history(tmp_path, 2)
+
+    def crash_on_append(file, mode='r', *args, **kwargs):
+        if mode == 'ab':
+            raise OSError('power loss')
+        return builtins_open(file, mode, *args, **kwargs)
+
+    # crash right after the manifest of a new segment was written
+    builtins_open = open
+    monkeypatch.setattr('builtins.open', crash_on_append)
+    with pytest.raises(OSError):
+        history.insert(_entry(_START + timedelta(days=2)))
+    monkeypatch.undo()
+
+    manifest = (tmp_path / 'manifest.json').read_text()
+    assert '2023-01-03' in manifest
+    reopened = SegmentedSensorHistory(str(tmp_path))
+    assert len(list(reopened)) == 2
+    assert reopened.insert(_entry(_START + timedelta(days=2))) == 3
+    assert len(reopened.range()) == 3
+
+
+def test_doc_ids_of_unlisted_segment_are_never_issued_again(tmp_path):
+    history = _daily_history(tmp_path, 2)
+    # segment file written without being listed in the manifest (crash before the manifest was written)
+    (tmp_path / '2023-01-03.seg').write_bytes(b'7\t' + SegmentedSensorHistory._SegmentedSensorHistory__dump(_entry(_START + timedelta(days=2))).encode('utf-8') + b'\n')
+
+    reopened = SegmentedSensorHistory(str(tmp_path))
+    assert (tmp_path / '2023-01-03.seg.orphan').exists()
+    assert len(reopened.range()) == 2
+    assert reopened.insert(_entry(_START + timedelta(days=2))) == 8
+    assert [document.doc_id for document in SegmentedSensorHistory(str(tmp_path)).range()] == [1, 2, 8]
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+
+import threading
+
+from tinydb import TinyDB
+from tinydb.middlewares import CachingMiddleware
+from tinydb.storages import JSONStorage
+
+from src.db.sensor_history_storage import TinyDbSensorHistory
+from src.db.storage_writer import StorageWriter
+
+
+def test_reads_wait_for_batch_of_writer(tmp_path):
+    db = TinyDB(str(tmp_path / 'sensor_history.json'), storage=CachingMiddleware(JSONStorage))
+    history = TinyDbSensorHistory(db.table('sensor_history'))
+    writer = StorageWriter()
+    history.attach_writer(writer)
+    history.insert({'ts': '2023-01-01T12:00:00', 'plants': []})
+
+    reads = []
+    with writer.lock:  # batch in progress
+        reader = threading.Thread(target=lambda: reads.extend([len(history.all()), len(list(history)), history.get(1) is not None]))
+        reader.start()
+        reader.join(timeout=0.2)
+        assert reader.is_alive()
+    reader.join(timeout=5)
+
+    assert reads == [1, 1, True]